@@ -0,0 +1,720 @@
+"""
+ksau_census.py — KnotInfo / LinkInfo センサスのバイナリ列キャッシュ
+
+SSOT.knot_data() の裏側で使われる。Researcher のコードから直接呼ぶ必要はない。
+
+パイプ区切り CSV (knotinfo_data_complete.csv 88 MB / linkinfo_data_complete.csv 15 MB)
+を初回だけ pandas のテキストパーサで読み、列ごとに .npy として data/cache/ に保存する。
+キャッシュは CSV の内容ハッシュ (SHA-256) をキーにしているため、
+CSV が差し替えられると自動的に作り直される。
+
+キャッシュ構成:
+
+    data/cache/digests.json                  CSV の (size, mtime_ns) → sha256 メモ
+    data/cache/<csv_stem>/<sha256[:16]>/
+        meta.json                            列名・dtype・行数
+        c0000.npy                            数値列（int64 / float64 / bool）
+        c0001.buf.npy / .off.npy / .na.npy   文字列列（UTF-8 バッファ + 文字オフセット + 欠損マスク）
+    data/cache/invariants/<knot_sha[:8]><link_sha[:8]>/
+        values.npy                           双曲的な結び目・絡み目の数値不変量行列 (n, 7) float64
+        table.npy / row.npy                  元テーブル（0=KnotInfo, 1=LinkInfo）と元の行番号
+        names.buf.npy / names.off.npy        名前の文字列オフセット表（UTF-8 バイトオフセット）
+    data/cache/linking/<knot_sha[:8]><link_sha[:8]>/
+        values.npy / offsets.npy             LinkInfo の絡み数行列（行優先で平坦化した int8 の CSR）
+        size.npy, is_brunnian.npy, ...       行列から導いた絡み目ごとの特徴量（LINKING_FEATURES）
+    data/cache/torsion/<knot_sha[:8]><link_sha[:8]>/
+        knot_offsets.npy / cover.npy         KnotInfo の torsion_numbers（結び目 → 被覆次数 n のエントリ）
+        coeff_offsets.npy / coeffs.npy       エントリ → ねじれ係数の CSR
+        min_torsion_<n>.npy, ...             派生列（初回の呼び出し時に保存）
+
+invariants/ の配列は np.load(mmap_mode='r') で開くため、複数プロセスが同時に
+開いても OS のページキャッシュを共有し、RAM はセンサス 1 つ分しか使わない。
+"""
+
+import ast
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# キャッシュ形式のバージョン。形式を変えたら上げること（古いキャッシュは無視される）。
+_CACHE_FORMAT = 2
+
+# 文字列列に混ざった文字列以外の値の型（型タグ 1, 2, 3。0 は文字列または欠損）
+_OBJECT_TYPES = (bool, int, float)
+
+# SSOT.knot_data() が従来使っていた read_csv の引数（キャッシュ構築時も同じものを使う）
+_READ_CSV_KWARGS = {"sep": "|", "skiprows": [1], "low_memory": False}
+
+_HASH_CHUNK = 1 << 20
+
+# derived_dir() で存在しない CSV に割り当てるダイジェスト
+_MISSING_DIGEST = "0" * 64
+
+# numeric=True で columns を省略したときに返す列
+CORE_NUMERIC_COLUMNS = ("name", "volume", "crossing_number", "determinant", "signature", "components")
+
+# KnotInfo / LinkInfo が「値なし」を表すのに使う文字列（numeric=True では NaN になる）
+SENTINEL_STRINGS = ("undefined", "Not Hyperbolic", "D.N.E.", "N/A", "")
+
+# 欠損がなく全て整数値なら int32 で返す列（それ以外は float64）
+INTEGER_COLUMNS = frozenset({
+    "crossing_number", "determinant", "signature", "components",
+    "unknotting_number", "unlinking_number", "braid_index", "bridge_index", "three_genus",
+})
+
+# numeric=True でも文字列のまま返す列
+TEXT_COLUMNS = frozenset({"name"})
+
+# 共有不変量行列の列（unknotting_number は LinkInfo では unlinking_number を使う）
+INVARIANT_FIELDS = (
+    "volume", "crossing_number", "determinant", "signature", "components",
+    "unknotting_number", "chern_simons_invariant",
+)
+
+
+def file_digest(path: Path, cache_dir: Path) -> str:
+    """
+    CSV の SHA-256 を返す。
+
+    88 MB を毎回ハッシュすると warm load が遅くなるため、
+    (size, mtime_ns) が変わっていなければ digests.json に記録した値を再利用する。
+    """
+    stat = path.stat()
+    memo_path = cache_dir / "digests.json"
+    memo = {}
+    if memo_path.exists():
+        try:
+            with open(memo_path, encoding="utf-8") as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            memo = {}
+
+    entry = memo.get(path.name)
+    if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    memo[path.name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = memo_path.with_name(f"{memo_path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(memo, f, indent=2)
+    os.replace(tmp, memo_path)
+    return digest
+
+
+def table_dir(csv_path: Path, cache_dir: Path) -> Path:
+    """CSV に対応するキャッシュディレクトリを返す（無ければ構築する）。"""
+    digest = file_digest(csv_path, cache_dir)
+    target = cache_dir / csv_path.stem / digest[:16]
+    meta_path = target / "meta.json"
+    if meta_path.exists():
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") == _CACHE_FORMAT and meta.get("sha256") == digest:
+            return target
+        shutil.rmtree(target, ignore_errors=True)
+
+    _build_table_cache(csv_path, digest, target)
+    return target
+
+
+def load_table(csv_path: Path, cache_dir: Path, columns=None, missing_ok: bool = False) -> pd.DataFrame:
+    """
+    CSV をキャッシュ経由で DataFrame として返す。
+
+    columns を与えた場合はその列だけを読む（存在しない列は無視される）。
+    返り値は pd.read_csv(csv_path, sep='|', skiprows=[1], low_memory=False) と同じ内容。
+    missing_ok=True なら、CSV が無いときに columns の列を持つ 0 行の DataFrame を返す。
+    """
+    if missing_ok and not csv_path.exists():
+        return pd.DataFrame(columns=list(dict.fromkeys(columns or [])), dtype=object)
+    target = table_dir(csv_path, cache_dir)
+    meta = read_meta(target)
+    specs = meta["columns"]
+    if columns is not None:
+        wanted = set(columns)
+        specs = [s for s in specs if s["name"] in wanted]
+
+    data = {s["name"]: read_column(target, s) for s in specs}
+    return pd.DataFrame(data, columns=[s["name"] for s in specs])
+
+
+def project(df: pd.DataFrame, columns, numeric: bool = False, is_knot: bool = False) -> pd.DataFrame:
+    """
+    load_table() の結果を columns の順に並べ直し、numeric=True なら数値へ変換する。
+
+    - テーブルに無い列は NaN 列になる（KnotInfo の components は 1 とみなす）。
+    - numeric=True では SENTINEL_STRINGS と数値化できない値を NaN にし、
+      INTEGER_COLUMNS のうち欠損なしの整数列は int32、それ以外は float64 にする。
+      TEXT_COLUMNS（name）は文字列のまま返す。
+    """
+    out = {}
+    for name in columns:
+        if name in df.columns:
+            col = df[name]
+        elif name == "components" and is_knot:
+            col = pd.Series(np.ones(len(df), dtype=np.int64), index=df.index)
+        else:
+            col = pd.Series(np.full(len(df), np.nan), index=df.index)
+
+        if numeric and name not in TEXT_COLUMNS:
+            col = to_numeric(col, integer=name in INTEGER_COLUMNS)
+        out[name] = col
+    return pd.DataFrame(out, index=df.index, columns=list(columns))
+
+
+def to_numeric(col: pd.Series, integer: bool = False) -> pd.Series:
+    """センサスの 1 列を float64（integer=True で欠損なしの整数値なら int32）に変換する。"""
+    if col.dtype.kind in "iufb":
+        values = col.to_numpy(dtype=np.float64)
+    else:
+        values = pd.to_numeric(col.where(~col.isin(SENTINEL_STRINGS)), errors="coerce").to_numpy(dtype=np.float64)
+
+    if integer and np.isfinite(values).all() and (values == np.round(values)).all():
+        return pd.Series(values.astype(np.int32), index=col.index)
+    return pd.Series(values, index=col.index)
+
+
+def read_meta(target: Path) -> dict:
+    """キャッシュディレクトリの meta.json を返す。"""
+    with open(target / "meta.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_column(target: Path, spec: dict) -> pd.Series:
+    """meta.json の列定義 spec に従って 1 列を復元する。"""
+    stem = target / spec["file"]
+    if spec["kind"] == "array":
+        return pd.Series(np.load(f"{stem}.npy"), dtype=spec["dtype"])
+
+    text = np.load(f"{stem}.buf.npy").tobytes().decode("utf-8")
+    off = np.load(f"{stem}.off.npy").tolist()
+    values = np.empty(len(off) - 1, dtype=object)
+    values[:] = [text[a:b] for a, b in zip(off[:-1], off[1:])]
+    type_path = Path(f"{stem}.type.npy")
+    if type_path.exists():
+        tags = np.load(type_path)
+        for tag, kind in enumerate(_OBJECT_TYPES, start=1):
+            idx = np.flatnonzero(tags == tag)
+            if kind is bool:
+                values[idx] = [v == "True" for v in values[idx]]
+            else:
+                values[idx] = [kind(v) for v in values[idx]]
+    na_path = Path(f"{stem}.na.npy")
+    if na_path.exists():
+        values[np.load(na_path)] = np.nan
+    return pd.Series(values, dtype=spec["dtype"])
+
+
+def _build_table_cache(csv_path: Path, digest: str, target: Path) -> None:
+    """CSV をテキストパーサで一度だけ読み、列ごとの .npy に書き出す。"""
+    df = pd.read_csv(csv_path, **_READ_CSV_KWARGS)
+
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    specs = []
+    for i, name in enumerate(df.columns):
+        col = df[name]
+        spec = {"name": name, "file": f"c{i:04d}", "dtype": str(col.dtype)}
+        if col.dtype.kind in "iufb":
+            spec["kind"] = "array"
+            np.save(tmp / f"{spec['file']}.npy", col.to_numpy())
+        else:
+            spec["kind"] = "string"
+            _save_strings(tmp / spec["file"], col)
+        specs.append(spec)
+
+    meta = {
+        "format": _CACHE_FORMAT,
+        "source": csv_path.name,
+        "sha256": digest,
+        "n_rows": int(len(df)),
+        "columns": specs,
+    }
+    with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    # 並列プロセスが同時に構築した場合は先に rename した方を採用する
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not (target / "meta.json").exists():
+            raise
+
+    # 同じ CSV の古いハッシュのキャッシュを掃除する
+    for old in target.parent.iterdir():
+        if old.is_dir() and old != target and not old.name.endswith(".tmp"):
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def _save_strings(stem: Path, col: pd.Series) -> None:
+    """
+    文字列列を UTF-8 バッファ + 文字オフセット + 欠損マスクとして保存する。
+    bool / int / float の値が混ざる object 列は、値ごとの型タグも保存して元の型に戻せるようにする。
+    """
+    na = col.isna().to_numpy()
+    items = col.tolist()
+    strings = ["" if m else str(v) for v, m in zip(items, na)]
+    tags = np.array([0 if m or isinstance(v, str) else
+                     next((t for t, kind in enumerate(_OBJECT_TYPES, start=1) if isinstance(v, kind)), 0)
+                     for v, m in zip(items, na)], dtype=np.int8)
+    lengths = np.fromiter((len(s) for s in strings), dtype=np.int64, count=len(strings))
+    off = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=off[1:])
+
+    np.save(f"{stem}.buf.npy", np.frombuffer("".join(strings).encode("utf-8"), dtype=np.uint8))
+    np.save(f"{stem}.off.npy", off)
+    if na.any():
+        np.save(f"{stem}.na.npy", na)
+    if tags.any():
+        np.save(f"{stem}.type.npy", tags)
+
+
+class InvariantMatrix:
+    """
+    双曲的な結び目・絡み目（volume > 0）の数値不変量を 1 枚にまとめた読み取り専用の共有行列。
+
+    values は (n, len(fields)) の float64 memmap で、KnotInfo の行が先、LinkInfo の行が後に並ぶ。
+    ワーカープロセスには path を渡し、InvariantMatrix(path) で開き直せばコピーは発生しない。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        meta = read_meta(self.path)
+        self.fields = tuple(meta["fields"])
+        self.values = np.load(self.path / "values.npy", mmap_mode="r")
+        self.table = np.load(self.path / "table.npy", mmap_mode="r")
+        self.row = np.load(self.path / "row.npy", mmap_mode="r")
+        self._names_buf = np.load(self.path / "names.buf.npy", mmap_mode="r")
+        self._names_off = np.load(self.path / "names.off.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def column(self, field: str) -> np.ndarray:
+        """不変量 1 列のビュー（コピーしない）を返す。"""
+        return self.values[:, self.fields.index(field)]
+
+    def name(self, i: int) -> str:
+        """i 行目の結び目・絡み目の名前を返す。"""
+        a, b = self._names_off[i], self._names_off[i + 1]
+        return self._names_buf[a:b].tobytes().decode("utf-8")
+
+    def names(self) -> list:
+        """全行の名前のリストを返す。"""
+        text = self._names_buf.tobytes().decode("utf-8")
+        off = self._names_off.tolist()
+        return [text[a:b] for a, b in zip(off[:-1], off[1:])]
+
+    def to_frame(self) -> pd.DataFrame:
+        """name / is_link 付きの DataFrame として返す（こちらはコピーになる）。"""
+        df = pd.DataFrame(np.asarray(self.values), columns=list(self.fields))
+        df.insert(0, "name", self.names())
+        df["is_link"] = np.asarray(self.table) == 1
+        return df
+
+
+def invariant_matrix_dir(knot_path: Path, link_path: Path, cache_dir: Path) -> Path:
+    """共有不変量行列のディレクトリを返す（無ければ構築する）。"""
+    return derived_dir("invariants", knot_path, link_path, cache_dir, _build_invariant_matrix)
+
+
+def _build_invariant_matrix(tmp: Path, knot_path: Path, link_path: Path, cache_dir: Path) -> dict:
+    frames = []
+    for table_id, (path, u_col) in enumerate([(knot_path, "unknotting_number"), (link_path, "unlinking_number")]):
+        raw = load_table(path, cache_dir, ["name", u_col, *INVARIANT_FIELDS], missing_ok=True)
+        df = project(raw, ["name", *INVARIANT_FIELDS], numeric=True, is_knot=table_id == 0)
+        if u_col in raw.columns:
+            df["unknotting_number"] = to_numeric(raw[u_col])
+        df = df[df["volume"] > 0]
+        df.insert(0, "table", table_id)
+        frames.append(df)
+    inv = pd.concat(frames)
+
+    np.save(tmp / "values.npy", inv[list(INVARIANT_FIELDS)].to_numpy(dtype=np.float64))
+    np.save(tmp / "table.npy", inv["table"].to_numpy(dtype=np.int8))
+    np.save(tmp / "row.npy", inv.index.to_numpy(dtype=np.int64))
+    save_name_table(tmp / "names", inv["name"].tolist())
+    return {"n_rows": int(len(inv)), "fields": list(INVARIANT_FIELDS)}
+
+
+# LinkingStore が絡み目ごとに保存する特徴量（列名 → 説明）
+LINKING_FEATURES = {
+    "size": "行列の次数（正方でなければ -1、欠損は 0）",
+    "is_brunnian": "絡み数がすべて 0（数を 1 つ以上含む行のみ True）",
+    "lk_total": "上三角の絡み数の和（正方でなければ 0）",
+    "lk_max_abs": "非対角の絡み数の絶対値の最大",
+    "lk_graph_components": "lk != 0 を辺とする成分グラフの連結成分数（正方でなければ -1）",
+    "lk_split": "成分グラフが非連結（ホモロジー的に分離、Brunnian を含む）",
+}
+
+
+class LinkingStore:
+    """
+    LinkInfo の linking_matrix を一度だけパースした CSR ストア（読み取り専用 memmap）。
+
+    i 番目（LinkInfo の行位置 i）の行列は values[offsets[i]:offsets[i + 1]] を size[i] 次の
+    正方行列に並べ直したもの。特徴量は LINKING_FEATURES の各列で、frame() でまとめて取れる。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.values = np.load(self.path / "values.npy", mmap_mode="r")
+        self.offsets = np.load(self.path / "offsets.npy", mmap_mode="r")
+        self.features = {k: np.load(self.path / f"{k}.npy", mmap_mode="r") for k in LINKING_FEATURES}
+        self._names_buf = np.load(self.path / "names.buf.npy", mmap_mode="r")
+        self._names_off = np.load(self.path / "names.off.npy", mmap_mode="r")
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, feature: str) -> np.ndarray:
+        return self.features[feature]
+
+    def matrix(self, i: int):
+        """i 番目の絡み数行列（正方でなければ平坦な配列、欠損なら None）。"""
+        flat = np.asarray(self.values[self.offsets[i]:self.offsets[i + 1]])
+        n = int(self.features["size"][i])
+        if n == 0:
+            return None
+        return flat.reshape(n, n) if n > 0 else flat
+
+    def names(self) -> list:
+        """全行の名前のリスト（LinkInfo の行順）。"""
+        text = self._names_buf.tobytes().decode("utf-8")
+        off = self._names_off.tolist()
+        return [text[a:b] for a, b in zip(off[:-1], off[1:])]
+
+    def positions(self, names) -> np.ndarray:
+        """
+        名前のリストを LinkInfo の行位置に変換する（向き付けなしの基底名も可）。
+
+        Raises:
+            KeyError: 見つからない名前がある場合
+        """
+        if self._index is None:
+            self._index = NameIndex([], self.names())
+        table, row = self._index.resolve_many(list(names))
+        if (table < 0).any():
+            missing = [n for n, t in zip(names, table) if t < 0]
+            raise KeyError(f"Link not found in linking store: {missing}")
+        return row
+
+    def frame(self) -> pd.DataFrame:
+        """name と全特徴量の DataFrame（LinkInfo の行順。links_df と行で揃う）。"""
+        df = pd.DataFrame({k: np.asarray(v) for k, v in self.features.items()})
+        df.insert(0, "name", self.names())
+        return df
+
+
+def linking_store_dir(knot_path: Path, link_path: Path, cache_dir: Path) -> Path:
+    """絡み数行列ストアのディレクトリを返す（無ければ構築する）。"""
+    return derived_dir("linking", knot_path, link_path, cache_dir, _build_linking_store)
+
+
+def _linking_components(mats: np.ndarray) -> np.ndarray:
+    """(m, n, n) の絡み数行列の束について、lk != 0 を辺とするグラフの連結成分数を返す。"""
+    m, n, _ = mats.shape
+    reach = ((mats != 0) | (mats.transpose(0, 2, 1) != 0) | np.eye(n, dtype=bool)).astype(np.int32)
+    for _ in range(max(1, int(np.ceil(np.log2(max(n, 2)))))):
+        reach = (np.matmul(reach, reach) > 0).astype(np.int32)
+    # 各頂点が属する成分の最小の頂点番号 == 自分自身 となる頂点の数が成分数
+    root = np.argmax(reach > 0, axis=2)
+    return (root == np.arange(n)).sum(axis=1)
+
+
+def _build_linking_store(tmp: Path, knot_path: Path, link_path: Path, cache_dir: Path) -> dict:
+    df = load_table(link_path, cache_dir, ["name", "linking_matrix"], missing_ok=True)
+    col = df["linking_matrix"] if "linking_matrix" in df.columns else pd.Series([None] * len(df))
+    tokens = col.astype("string").fillna("").str.findall(r"-?\d+").tolist()
+    counts = np.array([len(t) for t in tokens], dtype=np.int64)
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    flat = np.fromiter((int(x) for t in tokens for x in t), dtype=np.int64, count=int(offsets[-1]))
+    is_brunnian = np.array([bool(t) and all(x == "0" for x in t) for t in tokens], dtype=bool)
+
+    size = np.rint(np.sqrt(counts)).astype(np.int64)
+    size = np.where(counts == 0, 0, np.where(size * size == counts, size, -1))
+    lk_total = np.zeros(len(tokens), dtype=np.int64)
+    lk_max_abs = np.zeros(len(tokens), dtype=np.int64)
+    components = np.full(len(tokens), -1, dtype=np.int64)
+    for n in np.unique(size[size > 0]):
+        rows = np.flatnonzero(size == n)
+        idx = offsets[rows][:, None] + np.arange(n * n)
+        mats = flat[idx].reshape(len(rows), n, n)
+        off_diag = ~np.eye(n, dtype=bool)
+        lk_total[rows] = mats[:, np.triu(off_diag)].sum(axis=1)
+        lk_max_abs[rows] = np.abs(mats[:, off_diag]).max(axis=1) if n > 1 else 0
+        components[rows] = _linking_components(mats)
+    bad = np.flatnonzero(size < 0)
+    for i in bad:
+        seg = flat[offsets[i]:offsets[i + 1]]
+        lk_max_abs[i] = np.abs(seg).max()
+
+    info = np.iinfo(np.int8)
+    dtype = np.int8 if len(flat) == 0 or (flat.min() >= info.min and flat.max() <= info.max) else np.int16
+    np.save(tmp / "values.npy", flat.astype(dtype))
+    np.save(tmp / "offsets.npy", offsets)
+    np.save(tmp / "size.npy", size.astype(np.int8))
+    np.save(tmp / "is_brunnian.npy", is_brunnian)
+    np.save(tmp / "lk_total.npy", lk_total.astype(np.int32))
+    np.save(tmp / "lk_max_abs.npy", lk_max_abs.astype(np.int16))
+    np.save(tmp / "lk_graph_components.npy", components.astype(np.int8))
+    np.save(tmp / "lk_split.npy", components > 1)
+    save_name_table(tmp / "names", df["name"].tolist())
+    return {"n_rows": len(tokens), "n_values": int(offsets[-1]), "features": list(LINKING_FEATURES)}
+
+
+class TorsionStore:
+    """
+    KnotInfo の torsion_numbers（"[[2,[3]],[3,[2,2]]]" = n 重分岐被覆 → ねじれ係数のリスト）を
+    一度だけパースした CSR ストア。行は KnotInfo の行位置に揃う。
+
+    結び目 i のエントリは knot_offsets[i]:knot_offsets[i + 1] で、エントリ e の被覆次数は cover[e]、
+    ねじれ係数は coeffs[coeff_offsets[e]:coeff_offsets[e + 1]]（0 は自由部分 Z を表す）。
+    min_torsion(n) などの派生列は全結び目について配列で返し、ストアのディレクトリに保存する。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.knot_offsets = np.load(self.path / "knot_offsets.npy", mmap_mode="r")
+        self.cover = np.load(self.path / "cover.npy", mmap_mode="r")
+        self.coeff_offsets = np.load(self.path / "coeff_offsets.npy", mmap_mode="r")
+        self.coeffs = np.load(self.path / "coeffs.npy", mmap_mode="r")
+        self._derived = {}
+
+    def __len__(self) -> int:
+        return len(self.knot_offsets) - 1
+
+    def covers(self) -> np.ndarray:
+        """ストアに現れる被覆次数 n の一覧。"""
+        return np.unique(np.asarray(self.cover))
+
+    def entries(self, i: int) -> dict:
+        """結び目 i の {被覆次数 n: ねじれ係数のリスト}（従来 ast.literal_eval で得ていた内容）。"""
+        out = {}
+        for e in range(self.knot_offsets[i], self.knot_offsets[i + 1]):
+            a, b = self.coeff_offsets[e], self.coeff_offsets[e + 1]
+            out.setdefault(int(self.cover[e]), np.asarray(self.coeffs[a:b]).tolist())
+        return out
+
+    def _first_entry(self, n: int) -> np.ndarray:
+        """各結び目で被覆次数 n の最初のエントリ番号（無ければ -1）。"""
+        entry = np.flatnonzero(np.asarray(self.cover) == n)
+        owner = np.searchsorted(np.asarray(self.knot_offsets), entry, side="right") - 1
+        first = np.full(len(self), -1, dtype=np.int64)
+        first[owner[::-1]] = entry[::-1]
+        return first
+
+    def _derived_column(self, key: str, build) -> np.ndarray:
+        if key not in self._derived:
+            path = self.path / f"{key}.npy"
+            if not path.exists():
+                tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+                np.save(tmp, build())
+                os.replace(tmp, path)
+            self._derived[key] = np.load(path, mmap_mode="r")
+        return self._derived[key]
+
+    def _segments(self, n: int):
+        """被覆次数 n の最初のエントリを持つ結び目と、そのエントリの係数区間 [a, b)。"""
+        first = self._first_entry(n)
+        has = np.flatnonzero(first >= 0)
+        off = np.asarray(self.coeff_offsets)
+        return has, off[first[has]], off[first[has] + 1]
+
+    def min_torsion(self, n: int = 2) -> np.ndarray:
+        """
+        n 重分岐被覆の正のねじれ係数の最小値（float64、無い結び目は NaN）。
+        従来の parse_torsion(torsion_str, n_val=n) と同じく、最初の n のエントリだけを見る。
+        """
+        def build():
+            rows, a, b = self._segments(n)
+            positive = np.append(np.where(np.asarray(self.coeffs) > 0, np.asarray(self.coeffs, dtype=np.float64), np.inf), np.inf)
+            out = np.full(len(self), np.nan)
+            if len(rows):
+                # [a0, b0, a1, b1, ...] で reduceat すると偶数番目が区間 [a, b) の最小値になる
+                seg_min = np.minimum.reduceat(positive, np.column_stack([a, b]).ravel())[::2]
+                # 空のエントリは reduceat が a の要素そのものを返すので捨てる
+                seg_min = np.where(b > a, seg_min, np.inf)
+                out[rows] = np.where(np.isinf(seg_min), np.nan, seg_min)
+            return out
+
+        return self._derived_column(f"min_torsion_{n}", build)
+
+    def ln_st(self, n: int = 2) -> np.ndarray:
+        """ln(min_torsion(n))。研究コードの ln_st 列（無い結び目は NaN）。"""
+        return np.log(np.asarray(self.min_torsion(n)))
+
+    def torsion_rank(self, n: int = 2) -> np.ndarray:
+        """
+        n 重分岐被覆の 1 次ホモロジーの非自明な有限巡回因子（係数 > 1）の個数
+        （int32、n のエントリが無い結び目は -1）。
+        """
+        def build():
+            rows, a, b = self._segments(n)
+            nontrivial = np.append(np.asarray(self.coeffs) > 1, False).astype(np.int64)
+            csum = np.concatenate([[0], np.cumsum(nontrivial)])
+            out = np.full(len(self), -1, dtype=np.int32)
+            out[rows] = csum[b] - csum[a]
+            return out
+
+        return self._derived_column(f"torsion_rank_{n}", build)
+
+    def frame(self, covers=(2, 3)) -> pd.DataFrame:
+        """被覆次数ごとの min_torsion_<n>, torsion_rank_<n> と ln_st（n=2）の DataFrame（KnotInfo の行順）。"""
+        cols = {}
+        for n in covers:
+            cols[f"min_torsion_{n}"] = np.asarray(self.min_torsion(n))
+            cols[f"torsion_rank_{n}"] = np.asarray(self.torsion_rank(n))
+        cols["ln_st"] = self.ln_st(2)
+        return pd.DataFrame(cols)
+
+
+def parse_torsion_numbers(text):
+    """torsion_numbers の文字列を [(n, [係数...]), ...] に変換する。パースできなければ空リスト。"""
+    if not isinstance(text, str) or text in SENTINEL_STRINGS:
+        return []
+    try:
+        data = json.loads(text)
+    except ValueError:
+        try:
+            data = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            return []
+    out = []
+    for sub in data if isinstance(data, list) else []:
+        if isinstance(sub, (list, tuple)) and len(sub) == 2 and isinstance(sub[1], (list, tuple)):
+            out.append((int(sub[0]), [int(c) for c in sub[1]]))
+    return out
+
+
+def torsion_store_dir(knot_path: Path, link_path: Path, cache_dir: Path) -> Path:
+    """ねじれ係数ストアのディレクトリを返す（無ければ構築する）。"""
+    return derived_dir("torsion", knot_path, link_path, cache_dir, _build_torsion_store)
+
+
+def _build_torsion_store(tmp: Path, knot_path: Path, link_path: Path, cache_dir: Path) -> dict:
+    df = load_table(knot_path, cache_dir, ["torsion_numbers"], missing_ok=True)
+    col = df["torsion_numbers"] if "torsion_numbers" in df.columns else [None] * len(df)
+    parsed = [parse_torsion_numbers(t) for t in col]
+    knot_offsets = np.zeros(len(parsed) + 1, dtype=np.int64)
+    np.cumsum([len(p) for p in parsed], out=knot_offsets[1:])
+    cover = np.fromiter((n for p in parsed for n, _ in p), dtype=np.int32, count=int(knot_offsets[-1]))
+    lengths = [len(c) for p in parsed for _, c in p]
+    coeff_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=coeff_offsets[1:])
+    coeffs = np.fromiter((x for p in parsed for _, c in p for x in c), dtype=np.int64, count=int(coeff_offsets[-1]))
+
+    np.save(tmp / "knot_offsets.npy", knot_offsets)
+    np.save(tmp / "cover.npy", cover)
+    np.save(tmp / "coeff_offsets.npy", coeff_offsets)
+    np.save(tmp / "coeffs.npy", coeffs)
+    return {"n_rows": len(parsed), "n_entries": int(knot_offsets[-1]), "n_coeffs": int(coeff_offsets[-1])}
+
+
+def derived_dir(kind: str, knot_path: Path, link_path: Path, cache_dir: Path, build) -> Path:
+    """
+    KnotInfo + LinkInfo の両方から作る派生キャッシュのディレクトリを返す（無ければ構築する）。
+
+    キーは両 CSV のハッシュの組。build(tmp, knot_path, link_path, cache_dir) は tmp に
+    配列を書き出し、meta.json に追記する dict を返す。SSOT.knot_data() と同じく、存在しない CSV は
+    0 行のテーブルとして扱う（ダイジェストは _MISSING_DIGEST。CSV が置かれればキーが変わって再構築される）。
+    """
+    knot_digest = file_digest(knot_path, cache_dir) if knot_path.exists() else _MISSING_DIGEST
+    link_digest = file_digest(link_path, cache_dir) if link_path.exists() else _MISSING_DIGEST
+    target = cache_dir / kind / f"{knot_digest[:8]}{link_digest[:8]}"
+    meta_path = target / "meta.json"
+    if meta_path.exists() and read_meta(target).get("format") == _CACHE_FORMAT:
+        return target
+    # 古い形式（または構築途中）のディレクトリは os.replace で置き換えられないので先に消す
+    shutil.rmtree(target, ignore_errors=True)
+
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    meta = {
+        "format": _CACHE_FORMAT,
+        "sources": {knot_path.name: knot_digest, link_path.name: link_digest},
+    }
+    meta.update(build(tmp, knot_path, link_path, cache_dir))
+    with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not meta_path.exists():
+            raise
+
+    for old in target.parent.iterdir():
+        if old.is_dir() and old != target and not old.name.endswith(".tmp"):
+            shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+def save_name_table(stem: Path, names) -> None:
+    """名前のリストを UTF-8 バッファ + バイトオフセット表として保存する。"""
+    encoded = [str(n).encode("utf-8") for n in names]
+    off = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=off[1:])
+    np.save(f"{stem}.buf.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(f"{stem}.off.npy", off)
+
+
+class NameIndex:
+    """
+    結び目・絡み目の名前 → (table, row) のハッシュ索引。table は 0=KnotInfo, 1=LinkInfo、row は行位置。
+
+    LinkInfo の向き付け違い "L6a4{0,1}" は完全一致で引けるほか、
+    "{…}" を除いた基底名 "L6a4" でも最初の向き付け（CSV で最初に出る行）に解決される。
+    """
+
+    def __init__(self, knot_names, link_names):
+        self._exact = {}
+        self._base = {}
+        for table, names in enumerate((knot_names, link_names)):
+            for row, name in enumerate(names):
+                if not isinstance(name, str):
+                    continue
+                self._exact.setdefault(name, (table, row))
+                if "{" in name:
+                    self._base.setdefault(name.split("{", 1)[0], (table, row))
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def __contains__(self, name) -> bool:
+        return self.resolve(name) is not None
+
+    def resolve(self, name):
+        """name を (table, row) に解決する。見つからなければ None。"""
+        if not isinstance(name, str):
+            return None
+        name = name.strip()
+        hit = self._exact.get(name)
+        return hit if hit is not None else self._base.get(name)
+
+    def resolve_many(self, names) -> tuple[np.ndarray, np.ndarray]:
+        """names をまとめて解決し (table, row) の int 配列を返す。見つからない名前は -1。"""
+        hits = [self.resolve(n) or (-1, -1) for n in names]
+        table = np.fromiter((h[0] for h in hits), dtype=np.int8, count=len(hits))
+        row = np.fromiter((h[1] for h in hits), dtype=np.int64, count=len(hits))
+        return table, row
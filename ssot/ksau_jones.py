@@ -0,0 +1,480 @@
+"""
+ksau_jones.py — センサス全体の Jones 多項式ストア
+
+jones_polynomial_vector 列（"{min_deg, max_deg, c_0, c_1, ...}"）を一度だけパースし、
+CSR 形式（連続した int64 係数配列 + オフセット配列）で data/cache/jones/ に保存する。
+Researcher のコードでは多項式の文字列をパースせず、SSOT.jones_store() を使うこと。
+
+    ssot = SSOT()
+    store = ssot.jones_store()
+    i = store.position('4_1')
+    min_deg, coeffs = store.vector(i)
+
+    # (n_topologies, n_q) の複素行列。n = 3..1000 の 1 の冪根を全絡み目で一度に評価
+    q = np.exp(2j * np.pi / np.arange(3, 1001))
+    values = ssot.jones_eval(None, q)
+
+指数の単位:
+    KnotInfo（is_link=False）の指数は t の冪、
+    LinkInfo（is_link=True）の指数は x = t^½ の冪（すなわち t^{p/2}）。
+"""
+
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+import ksau_census
+
+_INT_RE = re.compile(r"-?\d+")
+
+# jones_eval() が一度に展開する多項式の行数（係数行列のメモリ上限を決める）
+_EVAL_CHUNK = 4096
+
+# CyclotomicCache.signs() が Jones 多項式の無い行に返す符号（-1, 0, +1 のどれとも区別する）
+MISSING_SIGN = -128
+
+# CyclotomicCache が一度に作る残差ヒストグラムのセル数の上限（行数 × 2n）
+_CYCLO_BLOCK_CELLS = 1 << 24
+
+# JonesRoots が一度に固有値分解するコンパニオン行列の要素数の上限（m × d × d）
+_ROOTS_CHUNK = 1 << 22
+
+
+def parse_jones_vector(vec_str):
+    """
+    "{min_deg, max_deg, c_0, ...}" を (min_deg, coeffs) に変換する。パースできなければ None。
+
+    max_deg は係数の個数から決まるため読み捨てる。
+    """
+    if not isinstance(vec_str, str):
+        return None
+    nums = _INT_RE.findall(vec_str)
+    if len(nums) < 3:
+        return None
+    return int(nums[0]), [int(c) for c in nums[2:]]
+
+
+class JonesStore:
+    """
+    KnotInfo → LinkInfo の順に全行の Jones 多項式を並べた CSR ストア（読み取り専用 memmap）。
+
+    i 番目の多項式の係数は coeffs[offsets[i]:offsets[i + 1]] で、指数は min_deg[i] から 1 刻み。
+    多項式が無い行は valid[i] == False で、係数は空。
+    i < n_knots が KnotInfo の行位置 i、i >= n_knots が LinkInfo の行位置 i - n_knots に対応する。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        meta = ksau_census.read_meta(self.path)
+        self.n_knots = int(meta["n_knots"])
+        self.coeffs = np.load(self.path / "coeffs.npy", mmap_mode="r")
+        self.offsets = np.load(self.path / "offsets.npy", mmap_mode="r")
+        self.min_deg = np.load(self.path / "min_deg.npy", mmap_mode="r")
+        self.max_deg = np.load(self.path / "max_deg.npy", mmap_mode="r")
+        self.is_link = np.load(self.path / "is_link.npy", mmap_mode="r")
+        self.valid = np.load(self.path / "valid.npy", mmap_mode="r")
+        self._names_buf = np.load(self.path / "names.buf.npy", mmap_mode="r")
+        self._names_off = np.load(self.path / "names.off.npy", mmap_mode="r")
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self.min_deg)
+
+    def vector(self, i: int) -> tuple[int, np.ndarray]:
+        """i 番目の多項式を (min_deg, coeffs) で返す。"""
+        return int(self.min_deg[i]), np.asarray(self.coeffs[self.offsets[i]:self.offsets[i + 1]])
+
+    def lengths(self) -> np.ndarray:
+        """各多項式の係数の個数。"""
+        return np.diff(self.offsets)
+
+    def segment_ids(self) -> np.ndarray:
+        """coeffs の各要素が属する多項式の番号。"""
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.lengths())
+
+    def exponents(self) -> np.ndarray:
+        """coeffs の各要素の指数（KnotInfo は t、LinkInfo は x = t^½ の単位）。"""
+        seg = self.segment_ids()
+        return np.asarray(self.min_deg, dtype=np.int64)[seg] + (np.arange(len(seg)) - np.asarray(self.offsets)[seg])
+
+    def name(self, i: int) -> str:
+        """i 番目の結び目・絡み目の名前。"""
+        a, b = self._names_off[i], self._names_off[i + 1]
+        return self._names_buf[a:b].tobytes().decode("utf-8")
+
+    def names(self) -> list:
+        """全行の名前のリスト。"""
+        text = self._names_buf.tobytes().decode("utf-8")
+        off = self._names_off.tolist()
+        return [text[a:b] for a, b in zip(off[:-1], off[1:])]
+
+    def positions(self, names) -> np.ndarray:
+        """
+        名前のリストをストア内の位置に変換する（向き付けなしの基底名も可）。
+
+        Raises:
+            KeyError: 見つからない名前がある場合
+        """
+        if self._index is None:
+            all_names = self.names()
+            self._index = ksau_census.NameIndex(all_names[:self.n_knots], all_names[self.n_knots:])
+        table, row = self._index.resolve_many(list(names))
+        if (table < 0).any():
+            missing = [n for n, t in zip(names, table) if t < 0]
+            raise KeyError(f"Topology not found in Jones store: {missing}")
+        return np.where(table == 1, row + self.n_knots, row)
+
+    def position(self, name: str) -> int:
+        """名前 1 つをストア内の位置に変換する。"""
+        return int(self.positions([name])[0])
+
+
+def jones_store_dir(knot_path: Path, link_path: Path, cache_dir: Path) -> Path:
+    """Jones ストアのディレクトリを返す（無ければ構築する）。"""
+    return ksau_census.derived_dir("jones", knot_path, link_path, cache_dir, _build_jones_store)
+
+
+def _build_jones_store(tmp: Path, knot_path: Path, link_path: Path, cache_dir: Path) -> dict:
+    names, vectors, is_link = [], [], []
+    n_knots = 0
+    for table_id, path in enumerate((knot_path, link_path)):
+        df = ksau_census.load_table(path, cache_dir, ["name", "jones_polynomial_vector"], missing_ok=True)
+        col = df["jones_polynomial_vector"] if "jones_polynomial_vector" in df.columns else [None] * len(df)
+        names.extend(df["name"].tolist())
+        vectors.extend(parse_jones_vector(v) for v in col)
+        is_link.extend([bool(table_id)] * len(df))
+        if table_id == 0:
+            n_knots = len(df)
+
+    valid = np.array([v is not None for v in vectors], dtype=bool)
+    lengths = np.array([len(v[1]) if v is not None else 0 for v in vectors], dtype=np.int64)
+    offsets = np.zeros(len(vectors) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    coeffs = np.fromiter((c for v in vectors if v is not None for c in v[1]), dtype=np.int64, count=int(offsets[-1]))
+    min_deg = np.array([v[0] if v is not None else 0 for v in vectors], dtype=np.int32)
+    max_deg = np.where(valid, min_deg + lengths - 1, 0).astype(np.int32)
+
+    np.save(tmp / "coeffs.npy", coeffs)
+    np.save(tmp / "offsets.npy", offsets)
+    np.save(tmp / "min_deg.npy", min_deg)
+    np.save(tmp / "max_deg.npy", max_deg)
+    np.save(tmp / "is_link.npy", np.array(is_link, dtype=bool))
+    np.save(tmp / "valid.npy", valid)
+    ksau_census.save_name_table(tmp / "names", names)
+    return {"n_rows": len(vectors), "n_knots": n_knots, "n_coeffs": int(offsets[-1])}
+
+
+def jones_eval(store: JonesStore, q_values, positions=None, raw_exponents: bool = False) -> np.ndarray:
+    """
+    ストア内の多項式を複数の q で一度に評価し、(n_topologies, n_q) の complex128 行列を返す。
+
+    KnotInfo は V(q) = Σ c_p q^p、LinkInfo は V(q) = Σ c_p q^{p/2} として評価する
+    （q^{1/2} は主枝 exp(Log(q)/2)。従来の `q ** (p / 2.0)` と同じ値）。
+    指数を q^{1/2} 単位にそろえた冪テーブル P[e, j] = q_j^{e/2} を一度だけ作り、
+    係数を (多項式 × 指数) の行列に並べて P との行列積で全区間和をまとめて取る。
+
+    Args:
+        store: SSOT.jones_store() の返り値
+        q_values: 評価点（スカラーまたは 1 次元配列、0 以外の複素数）
+        positions: 評価する多項式のストア内位置。None なら全行。
+        raw_exponents: True なら KnotInfo / LinkInfo を区別せず q_values を変数 x とみなして
+            Σ c_p x^p を返す（cycle_26 の evaluate_at_x と同じ規約。整数冪なので分枝の問題はない）
+
+    Returns:
+        多項式が無い行は NaN になる行列
+    """
+    q = np.atleast_1d(np.asarray(q_values, dtype=np.complex128))
+    pos = np.arange(len(store)) if positions is None else np.asarray(positions, dtype=np.int64)
+    out = np.full((len(pos), len(q)), np.nan, dtype=np.complex128)
+    if len(pos) == 0:
+        return out
+
+    # 指数を q^{1/2} 単位にそろえる（結び目は 2p、絡み目は p）。raw_exponents なら全行 p のまま
+    scale = np.where(np.asarray(store.is_link)[pos] | raw_exponents, 1, 2).astype(np.int64)
+    lengths = np.asarray(store.lengths())[pos]
+    min_half = np.asarray(store.min_deg, dtype=np.int64)[pos] * scale
+    max_half = (np.asarray(store.min_deg, dtype=np.int64)[pos] + np.maximum(lengths - 1, 0)) * scale
+    e_lo, e_hi = int(min_half.min()), int(max_half.max())
+
+    half_log_q = np.log(q) if raw_exponents else 0.5 * np.log(q)
+    power = np.exp(np.arange(e_lo, e_hi + 1)[:, None] * half_log_q[None, :])
+
+    offsets = np.asarray(store.offsets)
+    coeffs = np.asarray(store.coeffs)
+    valid = np.asarray(store.valid)[pos]
+    for start in range(0, len(pos), _EVAL_CHUNK):
+        block = slice(start, start + _EVAL_CHUNK)
+        blen = lengths[block]
+        seg = np.repeat(np.arange(len(blen)), blen)
+        first = np.repeat(offsets[pos[block]], blen)
+        within = np.arange(len(seg)) - np.repeat(np.cumsum(blen) - blen, blen)
+        half_exp = min_half[block][seg] + within * scale[block][seg]
+
+        dense = np.zeros((len(blen), e_hi - e_lo + 1))
+        dense[seg, half_exp - e_lo] = coeffs[first + within]
+        out[block] = dense @ power
+    out[~valid] = np.nan
+    return out
+
+
+def cyclotomic_polynomial(m: int) -> np.ndarray:
+    """円分多項式 Φ_m の整数係数（低次から）を返す。"""
+    return np.array(_cyclotomic_coeffs(m), dtype=np.int64)
+
+
+@lru_cache(maxsize=None)
+def _cyclotomic_coeffs(m: int) -> tuple:
+    # x^m - 1 を m の真の約数 d についての Φ_d で順に割る（いずれもモニックなので整数のまま割り切れる）
+    poly = np.zeros(m + 1, dtype=np.int64)
+    poly[0], poly[m] = -1, 1
+    for d in range(1, m):
+        if m % d == 0:
+            poly = _divide_monic(poly, cyclotomic_polynomial(d))
+    return tuple(poly.tolist())
+
+
+def _divide_monic(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    """モニック整数多項式 den で num を割った商（割り切れる前提）。"""
+    num = num.copy()
+    dq = len(num) - len(den)
+    quot = np.zeros(dq + 1, dtype=np.int64)
+    for k in range(dq, -1, -1):
+        quot[k] = num[k + len(den) - 1]
+        num[k:k + len(den)] -= quot[k] * den
+    return quot
+
+
+def reduce_cyclotomic(hist: np.ndarray, m: int) -> np.ndarray:
+    """
+    各行を多項式 Σ h_r x^r とみなし、Φ_m で割った余り（長さ φ(m) の整数係数）を返す。
+
+    Q(ζ_m) の冪基底 {1, ζ, ..., ζ^{φ(m)-1}} での厳密な座標になり、
+    2 つの値が等しいことと座標が一致することは同値。
+    """
+    phi = cyclotomic_polynomial(m)
+    deg = len(phi) - 1
+    rows = np.array(hist, dtype=np.int64, copy=True)
+    for k in range(rows.shape[1] - 1, deg - 1, -1):
+        lead = rows[:, k].copy()
+        if lead.any():
+            rows[:, k - deg:k + 1] -= lead[:, None] * phi[None, :]
+    return rows[:, :deg]
+
+
+class CyclotomicCache:
+    """
+    q = exp(2πi/n)（n >= 2）での Jones 値を、項ごとの剰余 r = 半整数指数 mod 2n から求めるキャッシュ。
+
+    q^{1/2} を主枝 exp(Log(q)/2) = ζ_{2n} に取るので（n >= 2 なら jones_eval() と同じ規約）、
+    結び目の t^p も絡み目の x^p = t^{p/2} も ζ_{2n}^r に落ちる。剰余は係数配列と同じ CSR の並び
+    （1 項に 1 つ、store.offsets で多項式に区切られる）で持ち、値は多項式ごとに Σ c ζ_{2n}^r を足し込む。
+    n ごとのディスク保存はせず、メモリに置くのも半整数指数と直近の n の剰余だけ。
+
+    円分体 Q(ζ_{2n}) での厳密な整数座標も返せるため、実部・虚部がちょうど 0 かどうかを
+    浮動小数点の誤差なしに判定できる（signs() 参照）。そのとき必要な長さ 2n の残差ヒストグラム
+    H[i, r] = Σ_{e ≡ r} c_e は、_CYCLO_BLOCK_CELLS を超えない行ブロックごとに作る。
+    """
+
+    def __init__(self, store: JonesStore):
+        self.store = store
+        self._half_exp = None
+        self._residues = (None, None)
+        self._unit = {}
+
+    def half_exponents(self) -> np.ndarray:
+        """項ごとの q^{1/2} 単位の指数（結び目は 2p、絡み目は p）。"""
+        if self._half_exp is None:
+            scale = np.where(np.asarray(self.store.is_link), 1, 2).astype(np.int64)
+            self._half_exp = self.store.exponents() * scale[self.store.segment_ids()]
+        return self._half_exp
+
+    def residues(self, n: int) -> np.ndarray:
+        """項ごとの剰余 r = 半整数指数 mod 2n（len(store.coeffs),）int32。"""
+        if n < 2:
+            raise ValueError(f"CyclotomicCache needs n >= 2 (got {n}); use jones_eval() for q = 1")
+        if self._residues[0] != n:
+            self._residues = (n, np.mod(self.half_exponents(), 2 * n).astype(np.int32))
+        return self._residues[1]
+
+    def histogram(self, n: int, positions=None) -> np.ndarray:
+        """positions の残差ヒストグラム (len(positions), 2n) int64（密行列なので行数に注意）。"""
+        pos = self._positions(positions)
+        m = 2 * n
+        terms, seg = self._terms(pos)
+        flat = np.bincount(seg * m + self.residues(n)[terms],
+                           weights=np.asarray(self.store.coeffs, dtype=np.float64)[terms],
+                           minlength=len(pos) * m)
+        return np.rint(flat).astype(np.int64).reshape(len(pos), m)
+
+    def unit_table(self, n: int) -> np.ndarray:
+        """単位円テーブル ζ_{2n}^r (r = 0..2n-1)。"""
+        if n not in self._unit:
+            self._unit[n] = np.exp(1j * np.pi * np.arange(2 * n) / n)
+        return self._unit[n]
+
+    def values(self, n: int, positions=None) -> np.ndarray:
+        """q = exp(2πi/n) での Jones 値（多項式が無い行は NaN）。jones_eval() と同じ値になる。"""
+        pos = self._positions(positions)
+        terms, seg = self._terms(pos)
+        z = self.unit_table(n)[self.residues(n)[terms]] * np.asarray(self.store.coeffs)[terms]
+        out = (np.bincount(seg, weights=z.real, minlength=len(pos))
+               + 1j * np.bincount(seg, weights=z.imag, minlength=len(pos)))
+        out[~np.asarray(self.store.valid)[pos]] = np.nan
+        return out
+
+    def coordinates(self, n: int, positions=None) -> np.ndarray:
+        """
+        Q(ζ_{2n}) の冪基底での整数座標 (len(positions), φ(2n)) を float64 で返す
+        （2^53 未満の整数なので厳密。多項式が無い行は values() と同じく NaN）。
+        """
+        pos = self._positions(positions)
+        coords = np.concatenate([reduce_cyclotomic(self.histogram(n, block), 2 * n)
+                                 for block in self._blocks(n, pos)]).astype(np.float64)
+        coords[~np.asarray(self.store.valid)[pos]] = np.nan
+        return coords
+
+    def signs(self, n: int, positions=None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Jones 値の実部・虚部の符号 (-1, 0, +1) を返す。
+
+        0 かどうかは z ± conj(z) の円分座標で厳密に判定し、0 でない場合だけ浮動小数点値の符号を使う。
+        多項式が無い行は実部・虚部とも MISSING_SIGN（-128）になる（0 = ちょうど 0 と区別するため）。
+        """
+        pos = self._positions(positions)
+        m = 2 * n
+        re_sign = np.empty(len(pos), dtype=np.int8)
+        im_sign = np.empty(len(pos), dtype=np.int8)
+        a = 0
+        for block in self._blocks(n, pos):
+            hist = self.histogram(n, block)
+            conj = hist[:, np.mod(-np.arange(m), m)]
+            re_zero = ~reduce_cyclotomic(hist + conj, m).any(axis=1)
+            im_zero = ~reduce_cyclotomic(hist - conj, m).any(axis=1)
+            z = hist @ self.unit_table(n)
+            re_sign[a:a + len(block)] = np.where(re_zero, 0, np.sign(z.real))
+            im_sign[a:a + len(block)] = np.where(im_zero, 0, np.sign(z.imag))
+            a += len(block)
+        missing = ~np.asarray(self.store.valid)[pos]
+        re_sign[missing] = MISSING_SIGN
+        im_sign[missing] = MISSING_SIGN
+        return re_sign, im_sign
+
+    def _positions(self, positions) -> np.ndarray:
+        if positions is None:
+            return np.arange(len(self.store))
+        return np.asarray(positions, dtype=np.int64)
+
+    def _terms(self, pos: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # positions の各多項式の項の位置と、その項が属する行（pos 内の番号）
+        offsets = np.asarray(self.store.offsets)
+        lengths = np.asarray(self.store.lengths())[pos]
+        seg = np.repeat(np.arange(len(pos)), lengths)
+        within = np.arange(len(seg)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(offsets[pos], lengths) + within, seg
+
+    def _blocks(self, n: int, pos: np.ndarray) -> list:
+        step = max(1, _CYCLO_BLOCK_CELLS // (2 * n))
+        return [pos[a:a + step] for a in range(0, len(pos), step)] or [pos]
+
+
+class JonesRoots:
+    """
+    全センサスの Jones 多項式の根（絶対値と偏角）を、次数ごとに積み重ねたコンパニオン行列の
+    一括固有値分解で求めた可変長配列。
+
+    根は各ストアの変数（KnotInfo は t、LinkInfo は x = t^½）についての根で、
+    従来の np.roots(coeffs[::-1]) と同じく min_deg によるずれ（原点の根）は含めない。
+    i 番目の多項式の根は modulus[offsets[i]:offsets[i + 1]] / phase[...]（偏角は (-π, π]）。
+
+    同じ係数列の多項式は 1 回だけ解き（係数列のハッシュで共有）、結果は JonesStore の
+    ディレクトリへ roots_*.npy として保存される。
+    """
+
+    def __init__(self, store: JonesStore):
+        self.store = store
+        paths = {k: store.path / f"roots_{k}.npy" for k in ("offsets", "modulus", "phase")}
+        if not all(p.exists() for p in paths.values()):
+            arrays = self._build()
+            for key, path in paths.items():
+                tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+                np.save(tmp, arrays[key])
+                os.replace(tmp, path)
+        self.offsets = np.load(paths["offsets"], mmap_mode="r")
+        self.modulus = np.load(paths["modulus"], mmap_mode="r")
+        self.phase = np.load(paths["phase"], mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _build(self) -> dict:
+        store = self.store
+        coeffs = np.asarray(store.coeffs)
+        offsets = np.asarray(store.offsets)
+
+        # 係数列のハッシュで同じ多項式をまとめ、両端の 0 を落とした形で 1 回だけ解く
+        unique, owner = {}, np.full(len(store), -1, dtype=np.int64)
+        polys = []
+        for i in range(len(store)):
+            c = coeffs[offsets[i]:offsets[i + 1]]
+            nz = np.flatnonzero(c)
+            if len(nz) == 0:
+                continue
+            c = c[nz[0]:nz[-1] + 1]
+            key = c.tobytes()
+            if key not in unique:
+                unique[key] = len(polys)
+                polys.append(c)
+            owner[i] = unique[key]
+
+        degree = np.array([len(c) - 1 for c in polys], dtype=np.int64)
+        roots = [None] * len(polys)
+        for d in np.unique(degree):
+            ids = np.flatnonzero(degree == d)
+            if d == 0:
+                for j in ids:
+                    roots[j] = np.empty(0, dtype=np.complex128)
+                continue
+            step = max(1, _ROOTS_CHUNK // int(d * d))
+            for a in range(0, len(ids), step):
+                block = ids[a:a + step]
+                c = np.array([polys[j] for j in block], dtype=np.float64)
+                # 昇順係数 c_0..c_d のモニック化: x^d + Σ (c_k / c_d) x^k のコンパニオン行列
+                comp = np.zeros((len(block), d, d))
+                comp[:, np.arange(1, d), np.arange(d - 1)] = 1.0
+                comp[:, :, -1] = -c[:, :-1] / c[:, -1:]
+                for j, r in zip(block, np.linalg.eigvals(comp)):
+                    roots[j] = r
+
+        counts = np.array([len(roots[o]) if o >= 0 else 0 for o in owner], dtype=np.int64)
+        out_off = np.zeros(len(store) + 1, dtype=np.int64)
+        np.cumsum(counts, out=out_off[1:])
+        flat = np.concatenate([roots[o] for o in owner if o >= 0] or [np.empty(0, dtype=np.complex128)])
+        return {"offsets": out_off, "modulus": np.abs(flat), "phase": np.angle(flat)}
+
+    def roots(self, i: int) -> np.ndarray:
+        """i 番目の多項式の根（複素数）。"""
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return np.asarray(self.modulus[a:b]) * np.exp(1j * np.asarray(self.phase[a:b]))
+
+    def segment_ids(self) -> np.ndarray:
+        """modulus / phase の各要素が属する多項式の番号。"""
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.offsets))
+
+    def phases(self, positions=None, min_phase: float = 0.01) -> tuple[np.ndarray, np.ndarray]:
+        """
+        原点でない根の |偏角| のうち min_phase を超えるものを (segment, |phase|) の平坦な配列で返す。
+        discrete_cs_validation.py の analyze_roots() の絞り込みを全行まとめて行うもの。
+        segment は positions 内の番号（positions=None なら多項式の番号）。
+        """
+        seg = self.segment_ids()
+        keep = (np.asarray(self.modulus) > 1e-8) & (np.abs(np.asarray(self.phase)) > min_phase)
+        if positions is not None:
+            pos = np.asarray(positions, dtype=np.int64)
+            lookup = np.full(len(self), -1, dtype=np.int64)
+            lookup[pos] = np.arange(len(pos))
+            seg = lookup[seg]
+            keep &= seg >= 0
+        return seg[keep], np.abs(np.asarray(self.phase))[keep]
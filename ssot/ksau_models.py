@@ -0,0 +1,577 @@
+"""
+ksau_models.py — KSAU 回帰モデルの共通部品（センサス規模のガウス過程回帰）
+
+sklearn の GaussianProcessRegressor（O(n³)）を「代表サンプル 1500〜2000 件」に絞って
+使っていた ST / アクシオン系のスクリプト向けに、同じ C * Matern + White のカーネル族で
+全双曲結び目を学習できる誘導点ガウス過程を提供する。
+
+    import ksau_models
+
+    gpr = ksau_models.SparseGPR(nu=2.5, n_inducing=500, n_restarts_optimizer=3, random_state=seed)
+    gpr.fit(X, y)                                  # X: (n, d)、n は数十万でよい
+    y_pred, y_std = gpr.predict(X_test, return_std=True)
+    print(gpr.kernel_)                             # "0.9**2 * Matern(length_scale=1.3, nu=2.5) + WhiteKernel(...)"
+
+Leave-One-Out 交差検証は loo_cv() で 1 回の分解から求める（n 回の再学習は不要）。
+
+    loo = ksau_models.loo_cv("ols", X, y)          # 線形回帰: ハット行列の対角
+    loo = ksau_models.loo_cv(gpr, X, y)            # 誘導点 GP: Woodbury で O(n m²)
+    loo = ksau_models.loo_cv(fit_predict, X, y, workers=8)   # 非線形モデルは並列の再学習
+    print(loo["r2_loo"], loo["mae"])
+
+セクター別質量則 ln m = η_s κ (V + α T + β S + γ_s K) + B_s は SectorMassLaw で配列形式に
+コンパイルし、differential_evolution の集団全体を 1 回の配列演算で評価する。
+
+    law = ksau_models.SectorMassLaw(ksau_models.sector_mass_data(ssot), kappa)
+    fit = law.fit(seed=42)                           # 観測質量への当てはめ
+    null = law.fit(rng.uniform(-5, 15, law.n), seed=42)   # 帰無データへの再当てはめも同じ速さ
+"""
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve, solve_triangular
+from scipy.optimize import differential_evolution, minimize
+
+# 誘導点との共分散 K(X, Z) を一度に作る行数（(chunk, n_inducing) 行列のメモリ上限を決める）
+_GP_CHUNK = 8192
+
+# コレスキー分解の安定化のために対角へ足す値
+_GP_JITTER = 1e-8
+
+# セクター別質量則の項と、既定の探索範囲（validator_fpr_test.py / h19_*.py と同じ）
+MASS_LAW_TERMS = ("eta", "intercept", "gamma", "alpha", "beta")
+MASS_LAW_BOUNDS = {
+    "eta": (0.1, 30.0),
+    "intercept": (-50.0, 50.0),
+    "gamma": (-1.0, 1.0),
+    "alpha": (0.0, 1.0),
+    "beta": (0.0, 1.0),
+}
+
+
+def matern(X1, X2, length_scale, nu: float) -> np.ndarray:
+    """
+    sklearn.gaussian_process.kernels.Matern と同じ相関関数（振幅 1）。
+
+    length_scale はスカラー（等方）または特徴量ごとの配列（ARD）。nu は 0.5, 1.5, 2.5, inf。
+    """
+    ls = np.asarray(length_scale, dtype=np.float64)
+    a = np.asarray(X1, dtype=np.float64) / ls
+    b = np.asarray(X2, dtype=np.float64) / ls
+    sq = np.maximum((a * a).sum(1)[:, None] + (b * b).sum(1)[None, :] - 2.0 * a @ b.T, 0.0)
+    if np.isinf(nu):
+        return np.exp(-0.5 * sq)
+    d = np.sqrt(sq)
+    if nu == 0.5:
+        return np.exp(-d)
+    if nu == 1.5:
+        d = np.sqrt(3.0) * d
+        return (1.0 + d) * np.exp(-d)
+    if nu == 2.5:
+        d = np.sqrt(5.0) * d
+        return (1.0 + d + d * d / 3.0) * np.exp(-d)
+    raise ValueError(f"nu must be 0.5, 1.5, 2.5 or inf (got {nu})")
+
+
+def _matern_with_grad(X, length_scale: float, nu: float):
+    """等方な matern(X, X) と、その log(length_scale) についての微分。"""
+    a = np.asarray(X, dtype=np.float64) / length_scale
+    sq = np.maximum((a * a).sum(1)[:, None] + (a * a).sum(1)[None, :] - 2.0 * a @ a.T, 0.0)
+    np.fill_diagonal(sq, 0.0)
+    if np.isinf(nu):
+        K = np.exp(-0.5 * sq)
+        return K, sq * K
+    d = np.sqrt(sq)
+    if nu == 0.5:
+        K = np.exp(-d)
+        return K, d * K
+    if nu == 1.5:
+        r = np.sqrt(3.0) * d
+        e = np.exp(-r)
+        return (1.0 + r) * e, r * r * e
+    if nu == 2.5:
+        r = np.sqrt(5.0) * d
+        e = np.exp(-r)
+        return (1.0 + r + r * r / 3.0) * e, r * r * (1.0 + r) / 3.0 * e
+    raise ValueError(f"nu must be 0.5, 1.5, 2.5 or inf (got {nu})")
+
+
+class SparseGPR:
+    """
+    C * Matern(ν) + WhiteKernel のガウス過程回帰を誘導点近似（DTC / Titsias の予測分布）で解く。
+
+    - ハイパーパラメータ（振幅 C、長さスケール、白色雑音）は、学習データから取った
+      大きさ batch_size のミニバッチ n_batches 個の厳密な対数周辺尤度の和を
+      L-BFGS-B で最大化して決める（1 回の評価は O(n_batches · batch_size³)）。
+      初期値と、境界内の対数一様な n_restarts_optimizer 個の初期値から最適化する（sklearn と同じ）。
+    - 予測は学習データ全体から選んだ n_inducing 個の誘導点を通して行い、計算量は O(n m²)、
+      メモリは O(m² + _GP_CHUNK · m)。n <= n_inducing なら全点が誘導点になり厳密な GP と一致する。
+
+    predict(return_std=True) の標準偏差は sklearn と同じく白色雑音を含む。
+    """
+
+    def __init__(self, nu: float = 2.5, length_scale=1.0, constant: float = 1.0, noise_level: float = 0.1,
+                 constant_bounds=(1e-5, 1e5), length_scale_bounds=(1e-5, 1e5), noise_level_bounds=(1e-5, 1e5),
+                 n_inducing: int = 500, batch_size: int = 1000, n_batches: int = 4,
+                 n_restarts_optimizer: int = 0, normalize_y: bool = False, random_state=None):
+        self.nu = nu
+        self.length_scale = length_scale
+        self.constant = constant
+        self.noise_level = noise_level
+        self.constant_bounds = constant_bounds
+        self.length_scale_bounds = length_scale_bounds
+        self.noise_level_bounds = noise_level_bounds
+        self.n_inducing = n_inducing
+        self.batch_size = batch_size
+        self.n_batches = n_batches
+        self.n_restarts_optimizer = n_restarts_optimizer
+        self.normalize_y = normalize_y
+        self.random_state = random_state
+
+    # --- ハイパーパラメータ ---
+
+    def _pack(self, constant, length_scale, noise_level) -> np.ndarray:
+        return np.log(np.concatenate([[constant], np.atleast_1d(length_scale), [noise_level]]))
+
+    def _unpack(self, theta):
+        p = np.exp(theta)
+        ls = p[1:-1] if len(p) > 3 else p[1]
+        return p[0], ls, p[-1]
+
+    def _bounds(self, n_ls: int) -> np.ndarray:
+        return np.log(np.array([self.constant_bounds] + [self.length_scale_bounds] * n_ls + [self.noise_level_bounds],
+                               dtype=np.float64))
+
+    def _neg_log_marginal(self, theta, batches):
+        """
+        ミニバッチの負の対数周辺尤度の和と、log パラメータについての勾配。
+        長さスケールが等方なら解析的な勾配を返し、ARD のときは値だけ返す（数値微分に任せる）。
+        """
+        c, ls, noise = self._unpack(theta)
+        isotropic = np.isscalar(ls)
+        total = 0.0
+        grad = np.zeros(len(theta))
+        for Xb, yb in batches:
+            if isotropic:
+                R, dR = _matern_with_grad(Xb, ls, self.nu)
+            else:
+                R = matern(Xb, Xb, ls, self.nu)
+            K = c * R
+            K[np.diag_indices_from(K)] += noise + _GP_JITTER
+            try:
+                L = np.linalg.cholesky(K)
+            except np.linalg.LinAlgError:
+                return (np.inf, grad) if isotropic else np.inf
+            alpha = cho_solve((L, True), yb)
+            total += 0.5 * yb @ alpha + np.log(np.diag(L)).sum() + 0.5 * len(yb) * np.log(2 * np.pi)
+            if isotropic:
+                # ∂(-log ML)/∂θ = ½ tr((K⁻¹ - ααᵀ) ∂K/∂θ)
+                G = cho_solve((L, True), np.eye(len(yb))) - np.outer(alpha, alpha)
+                grad += 0.5 * np.array([c * (G * R).sum(), c * (G * dR).sum(), noise * np.trace(G)])
+        return (float(total), grad) if isotropic else float(total)
+
+    # --- 学習・予測 ---
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[:, None]
+        rng = np.random.default_rng(self.random_state)
+        n = len(X)
+
+        if self.normalize_y:
+            self._y_mean, self._y_std = y.mean(), (y.std() or 1.0)
+        else:
+            self._y_mean, self._y_std = 0.0, 1.0
+        yn = (y - self._y_mean) / self._y_std
+
+        # ミニバッチ（互いに重ならない無作為抽出。データが少なければ全体 1 つ）
+        if n <= self.batch_size:
+            batches = [(X, yn)]
+        else:
+            perm = rng.permutation(n)
+            k = min(self.n_batches, n // self.batch_size)
+            batches = [(X[idx], yn[idx]) for idx in np.split(perm[:k * self.batch_size], k)]
+
+        theta0 = self._pack(self.constant, self.length_scale, self.noise_level)
+        bounds = self._bounds(len(theta0) - 2)
+        starts = [theta0] + [rng.uniform(bounds[:, 0], bounds[:, 1]) for _ in range(self.n_restarts_optimizer)]
+        best = None
+        for start in starts:
+            res = minimize(self._neg_log_marginal, start, args=(batches,), method="L-BFGS-B", bounds=bounds,
+                           jac=len(start) == 3)
+            if best is None or res.fun < best.fun:
+                best = res
+        self.theta_ = best.x
+        self.log_marginal_likelihood_value_ = -float(best.fun)
+        c, ls, noise = self._unpack(self.theta_)
+        self.constant_, self.length_scale_, self.noise_level_ = c, ls, noise
+
+        # 誘導点（学習データからの無作為抽出）と、白色化した予測用の行列
+        m = min(self.n_inducing, n)
+        Z = X if m == n else X[np.sort(rng.choice(n, m, replace=False))]
+        Kmm = c * matern(Z, Z, ls, self.nu)
+        Kmm[np.diag_indices_from(Kmm)] += _GP_JITTER * c
+        Lm = np.linalg.cholesky(Kmm)
+        # A = σ² I + V Vᵀ、b = V y（V = Lm⁻¹ K(Z, X)）を行ブロックごとに足し込む
+        A = np.zeros((m, m))
+        b = np.zeros(m)
+        for a in range(0, n, _GP_CHUNK):
+            V = solve_triangular(Lm, c * matern(Z, X[a:a + _GP_CHUNK], ls, self.nu), lower=True)
+            A += V @ V.T
+            b += V @ yn[a:a + _GP_CHUNK]
+        A[np.diag_indices_from(A)] += noise
+        self._Z, self._Lm = Z, Lm
+        self._LA = cho_factor(A, lower=True)
+        self._w = cho_solve(self._LA, b)
+        return self
+
+    def predict(self, X, return_std: bool = False):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[:, None]
+        c, ls, noise = self.constant_, self.length_scale_, self.noise_level_
+        mean = np.empty(len(X))
+        std = np.empty(len(X)) if return_std else None
+        for a in range(0, len(X), _GP_CHUNK):
+            W = solve_triangular(self._Lm, c * matern(self._Z, X[a:a + _GP_CHUNK], ls, self.nu), lower=True)
+            mean[a:a + _GP_CHUNK] = W.T @ self._w
+            if return_std:
+                # 潜在関数の分散 = c - ‖W‖² + σ² ‖L_A⁻¹ W‖²、観測の分散はこれに σ² を足す
+                S = cho_solve(self._LA, W)
+                var = c - (W * W).sum(0) + noise * (W * S).sum(0)
+                std[a:a + _GP_CHUNK] = np.sqrt(np.maximum(var, 0.0) + noise)
+        mean = mean * self._y_std + self._y_mean
+        if return_std:
+            return mean, std * self._y_std
+        return mean
+
+    def score(self, X, y) -> float:
+        """決定係数 R²（sklearn の score と同じ）。"""
+        y = np.asarray(y, dtype=np.float64)
+        resid = y - self.predict(X)
+        return 1.0 - float(resid @ resid) / float(((y - y.mean()) ** 2).sum())
+
+    @property
+    def kernel_(self) -> str:
+        """学習後のカーネル（sklearn の str(gpr.kernel_) と同じ書式）。"""
+        ls = self.length_scale_
+        ls_str = f"{ls:.3g}" if np.isscalar(ls) else "[" + ", ".join(f"{v:.3g}" for v in ls) + "]"
+        return (f"{np.sqrt(self.constant_):.3g}**2 * Matern(length_scale={ls_str}, nu={self.nu})"
+                f" + WhiteKernel(noise_level={self.noise_level_:.3g})")
+
+
+# --- Leave-One-Out 交差検証 ---
+
+def _loo_summary(y: np.ndarray, pred: np.ndarray, method: str, **extra) -> dict:
+    resid = y - pred
+    ss_tot = float(((y - y.mean()) ** 2).sum())
+    out = {
+        "pred": pred,
+        "residuals": resid,
+        "r2_loo": 1.0 - float(np.nansum(resid ** 2)) / ss_tot if ss_tot > 0 else float("nan"),
+        "mae": float(np.nanmean(np.abs(resid))),
+        "rmse": float(np.sqrt(np.nanmean(resid ** 2))),
+        "n": len(y),
+        "method": method,
+    }
+    out.update(extra)
+    return out
+
+
+def loo_linear(X, y, alpha: float = 0.0, fit_intercept: bool = True) -> dict:
+    """
+    OLS / リッジ回帰の LOO 予測をハット行列の対角から求める（e_i^LOO = e_i / (1 - h_ii)）。
+
+    alpha > 0 でリッジ（切片には罰則をかけない）。fit_intercept=False は原点を通る回帰
+    （loo_cv_validation.py の slope = Σxy / Σx²）。てこ比 h_ii = 1 の点の LOO 予測は NaN。
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    D = np.column_stack([np.ones(len(X)), X]) if fit_intercept else X
+    penalty = np.full(D.shape[1], alpha)
+    if fit_intercept:
+        penalty[0] = 0.0
+    G = D.T @ D + np.diag(penalty)
+    coef = np.linalg.lstsq(G, D.T @ y, rcond=None)[0]
+    leverage = np.einsum("ij,ji->i", D, np.linalg.pinv(G) @ D.T)
+    resid = y - D @ coef
+    with np.errstate(divide="ignore", invalid="ignore"):
+        loo_resid = np.where(leverage < 1.0 - 1e-12, resid / (1.0 - leverage), np.nan)
+    return _loo_summary(y, y - loo_resid, "closed_form", coef=coef, leverage=leverage)
+
+
+def loo_gp(K, y, y_mean: float = 0.0) -> dict:
+    """
+    事前平均 y_mean、観測の共分散 K（雑音を含む）のガウス過程の LOO 予測分布
+    μ_i = y_i - (K⁻¹y)_i / (K⁻¹)_ii、σ_i² = 1 / (K⁻¹)_ii をコレスキー分解 1 回で求める。
+    ハイパーパラメータは固定（全データで学習した値）として扱う。
+    """
+    y = np.asarray(y, dtype=np.float64)
+    L = cho_factor(np.asarray(K, dtype=np.float64), lower=True)
+    Kinv = cho_solve(L, np.eye(len(y)))
+    diag = np.diag(Kinv)
+    alpha = Kinv @ (y - y_mean)
+    pred = y - alpha / diag
+    return _loo_summary(y, pred, "closed_form", std=np.sqrt(1.0 / diag))
+
+
+def loo_sparse_gp(model: "SparseGPR", X, y) -> dict:
+    """
+    学習済み SparseGPR の誘導点近似（DTC / SoR）モデルそのものの LOO 予測分布を O(n m²) で求める。
+
+    観測の共分散 Σ = Q + σ² I（Q = Vᵀ V、V = L_m⁻¹ K(Z, X)）に Woodbury の公式を使うと
+    Σ⁻¹ = σ⁻² (I - Vᵀ A⁻¹ V)（A = σ² I + V Vᵀ）なので、w = A⁻¹ V y として
+    μ_i = y_i - (y_i - v_iᵀ w) / (1 - v_iᵀ A⁻¹ v_i)、σ_i² = σ² / (1 - v_iᵀ A⁻¹ v_i)。
+    V は _GP_CHUNK 列ずつ作り直すので n × n の行列は作らない。
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    c, ls, noise = model.constant_, model.length_scale_, model.noise_level_
+    yn = (y - model._y_mean) / model._y_std
+    m = len(model._Z)
+
+    def factor(a):
+        return solve_triangular(model._Lm, c * matern(model._Z, X[a:a + _GP_CHUNK], ls, model.nu), lower=True)
+
+    A = np.zeros((m, m))
+    b = np.zeros(m)
+    for a in range(0, len(X), _GP_CHUNK):
+        V = factor(a)
+        A += V @ V.T
+        b += V @ yn[a:a + _GP_CHUNK]
+    A[np.diag_indices_from(A)] += noise
+    LA = cho_factor(A, lower=True)
+    w = cho_solve(LA, b)
+
+    pred = np.empty(len(X))
+    var = np.empty(len(X))
+    for a in range(0, len(X), _GP_CHUNK):
+        V = factor(a)
+        keep = 1.0 - (V * cho_solve(LA, V)).sum(0)
+        pred[a:a + _GP_CHUNK] = yn[a:a + _GP_CHUNK] - (yn[a:a + _GP_CHUNK] - V.T @ w) / keep
+        var[a:a + _GP_CHUNK] = noise / keep
+    return _loo_summary(y, pred * model._y_std + model._y_mean, "closed_form",
+                        std=np.sqrt(var) * model._y_std)
+
+
+def _loo_refit_task(args):
+    fit_predict, X, y, idx = args
+    out = []
+    for i in idx:
+        train = np.arange(len(y)) != i
+        out.append(float(np.asarray(fit_predict(X[train], y[train], X[i:i + 1])).ravel()[0]))
+    return out
+
+
+def loo_cv(model, X, y, workers: int = 1, alpha: float = 0.0, fit_intercept: bool = True) -> dict:
+    """
+    LOO 交差検証を、閉じた形が使えるモデルは 1 回の分解で、それ以外は n 回の再学習で行う。
+
+    Args:
+        model: "ols" / "ridge"（alpha）/ "origin"（原点を通る回帰）、SparseGPR（未学習なら全データで
+            学習してから、誘導点近似モデルの閉じた形。loo_sparse_gp()）、または
+            fit_predict(X_train, y_train, X_test) -> 予測値 の関数（非線形モデル。並列で再学習）
+        workers: 再学習のプロセス数（fit_predict はモジュールのトップレベル関数にすること）
+
+    Returns:
+        {'pred', 'residuals', 'r2_loo', 'mae', 'rmse', 'n', 'method'}（GP は 'std'、線形は 'coef', 'leverage' も）
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    if isinstance(model, str):
+        if model not in ("ols", "ridge", "origin"):
+            raise ValueError(f"Unknown model for loo_cv: {model}")
+        return loo_linear(X, y, alpha=alpha if model == "ridge" else 0.0, fit_intercept=model != "origin")
+    if isinstance(model, SparseGPR):
+        if not hasattr(model, "theta_"):
+            model.fit(X, y)
+        return loo_sparse_gp(model, X, y)
+
+    n = len(y)
+    workers = max(1, min(workers, n))
+    tasks = [(model, X, y, idx) for idx in np.array_split(np.arange(n), workers * 4 if workers > 1 else 1)]
+    if workers == 1:
+        parts = [_loo_refit_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            parts = list(ex.map(_loo_refit_task, tasks))
+    pred = np.array([v for part in parts for v in part])
+    return _loo_summary(y, pred, "refit")
+
+
+# --- セクター別質量則 ---
+
+def _first_int(val, default: float = 0.0) -> float:
+    if pd.isnull(val):
+        return default
+    nums = re.findall(r"-?\d+", str(val).strip())
+    return float(nums[0]) if nums else default
+
+
+def sector_mass_data(ssot) -> pd.DataFrame:
+    """
+    SSOT の割り当てから質量則の入力表を作る（cycle_09 の base_data と同じ行と値）。
+
+    列は name, s_key（quarks_c2 / quarks_c3 / leptons / bosons）, V, T, S, K, C, m_obs, ln_m_obs。
+    T = (2 - 世代) (-1)^成分数、S は割り当てた結び目・絡み目の符号数（読めなければ 0）。
+    """
+    topo = ssot.topology_assignments()
+    knots_df, links_df = ssot.knot_data(columns=["name", "signature"])
+    params = ssot.parameters()
+    signature = {**dict(zip(knots_df["name"], knots_df["signature"])),
+                 **dict(zip(links_df["name"], links_df["signature"]))}
+    rows = []
+    for sector_name in ["quarks", "leptons", "bosons"]:
+        for p_name, p_data in params[sector_name].items():
+            if p_name not in topo:
+                continue
+            info = topo[p_name]
+            mass = p_data.get("observed_mass_mev") or p_data.get("observed_mass")
+            if not mass:
+                continue
+            s_key = f"quarks_c{info['components']}" if sector_name == "quarks" else sector_name
+            rows.append({
+                "name": p_name, "s_key": s_key,
+                "V": info["volume"],
+                "T": (2 - info.get("generation", 2)) * ((-1) ** info["components"]),
+                "S": _first_int(signature.get(info["topology"])),
+                "K": info["crossing_number"], "C": info["components"],
+                "m_obs": mass, "ln_m_obs": np.log(mass),
+            })
+    return pd.DataFrame(rows)
+
+
+class SectorMassLaw:
+    """
+    ln m = η_s κ (V + α T + β S + γ_s K) + B_s を、セクター添字ベクトルとパラメータ列の対応表に
+    コンパイルしたもの。
+
+    各項（eta / intercept / gamma / alpha / beta）の指定:
+        "sector" — セクターごとに 1 つ（セクター名の昇順）
+        "shared" — 全セクターで 1 つ
+        {s_key: グループ名} — グループごとに 1 つ（例: 2 つのクォーク・セクターで B を共有）
+        数値 — 固定値（h19_*.py の α = β = 0.1 など）
+
+    predict() / objective() はパラメータ (n_params,) でも集団 (n_params, S) でも受け付けるので、
+    differential_evolution(vectorized=True) に 1 世代ぶんをまとめて渡せる。
+    """
+
+    def __init__(self, data, kappa: float, eta="sector", intercept="sector", gamma="sector",
+                 alpha="shared", beta="shared", interaction: str = "all", bounds: dict = None):
+        """
+        Args:
+            data: sector_mass_data() の表、または同じキーを持つ dict のリスト
+            interaction: "all" なら γ K を全粒子に、"multi" なら成分数 C > 1 の粒子だけに掛ける
+            bounds: 項ごとの探索範囲の上書き（既定は MASS_LAW_BOUNDS）
+        """
+        df = pd.DataFrame(data)
+        self.kappa = float(kappa)
+        self.names = list(df["name"]) if "name" in df else list(range(len(df)))
+        self.sectors = sorted(df["s_key"].unique())
+        sector_idx = np.searchsorted(self.sectors, df["s_key"].to_numpy())
+        self.V = df["V"].to_numpy(np.float64)
+        self.T = df["T"].to_numpy(np.float64)
+        self.S = df["S"].to_numpy(np.float64)
+        self.K = df["K"].to_numpy(np.float64)
+        if interaction == "multi":
+            self.K = np.where(df["C"].to_numpy() > 1, self.K, 0.0)
+        elif interaction != "all":
+            raise ValueError(f"interaction must be 'all' or 'multi' (got {interaction})")
+        self.ln_m_obs = df["ln_m_obs"].to_numpy(np.float64) if "ln_m_obs" in df else None
+        self.n = len(df)
+
+        spec = {"eta": eta, "intercept": intercept, "gamma": gamma, "alpha": alpha, "beta": beta}
+        limits = {**MASS_LAW_BOUNDS, **(bounds or {})}
+        self.param_names, self.bounds, fixed = [], [], []
+        cols = np.empty((len(MASS_LAW_TERMS), len(self.sectors)), dtype=np.int64)
+        for t, term in enumerate(MASS_LAW_TERMS):
+            s = spec[term]
+            if isinstance(s, (int, float)):
+                cols[t] = -1 - len(fixed)
+                fixed.append(float(s))
+                continue
+            if s == "sector":
+                group = {k: k for k in self.sectors}
+            elif s == "shared":
+                group = {k: None for k in self.sectors}
+            elif isinstance(s, dict):
+                group = {k: s[k] for k in self.sectors}
+            else:
+                raise ValueError(f"Unknown spec for {term}: {s}")
+            present = set(group.values())
+            for label in [g for g in dict.fromkeys(s.values() if isinstance(s, dict) else group.values()) if g in present]:
+                col = len(self.param_names)
+                self.param_names.append(term if label is None else f"{term}[{label}]")
+                self.bounds.append(limits[term])
+                cols[t, [i for i, k in enumerate(self.sectors) if group[k] == label]] = col
+        self.n_params = len(self.param_names)
+        # 固定値はパラメータ列の後ろに付け足して、同じ添字引きで取り出す
+        self._fixed = np.array(fixed, dtype=np.float64)
+        self._cols = np.where(cols < 0, self.n_params - 1 - cols, cols)[:, sector_idx]
+
+    def predict(self, params) -> np.ndarray:
+        """ln m の予測。params (n_params,) なら (n,)、(n_params, S) なら (n, S)。"""
+        p = np.asarray(params, dtype=np.float64)
+        single = p.ndim == 1
+        if single:
+            p = p[:, None]
+        ext = np.concatenate([p, np.broadcast_to(self._fixed[:, None], (len(self._fixed), p.shape[1]))])
+        eta, B, gamma, alpha, beta = ext[self._cols]
+        pred = eta * self.kappa * (self.V[:, None] + alpha * self.T[:, None] + beta * self.S[:, None]
+                                   + gamma * self.K[:, None]) + B
+        return pred[:, 0] if single else pred
+
+    def objective(self, params, y=None):
+        """ln m の平均二乗誤差（differential_evolution に渡す目的関数）。"""
+        y = self.ln_m_obs if y is None else np.asarray(y, dtype=np.float64)
+        pred = self.predict(params)
+        resid = pred - (y if pred.ndim == 1 else y[:, None])
+        return np.mean(resid * resid, axis=0)
+
+    def mae_pct(self, params, y=None):
+        """質量の平均相対誤差 [%]（mean |m_pred / m_obs - 1| × 100）。"""
+        y = self.ln_m_obs if y is None else np.asarray(y, dtype=np.float64)
+        pred = self.predict(params)
+        return 100.0 * np.mean(np.abs(np.expm1(pred - (y if pred.ndim == 1 else y[:, None]))), axis=0)
+
+    def fit(self, y=None, seed=42, maxiter: int = 1000, tol: float = 0.01, workers: int = 1,
+            strategy: str = "best1bin", **kwargs) -> dict:
+        """
+        differential_evolution で当てはめる。workers == 1 なら集団をまとめて評価（vectorized=True）、
+        workers > 1 なら個体をプロセスに分けて評価する。どちらも updating="deferred" なので
+        世代ごとの更新規則は同じ（legacy の "immediate" とは探索の経路が異なる）。
+
+        Args:
+            y: 当てはめる ln m（None なら観測値。帰無試行ではランダムな値を渡す）
+            kwargs: differential_evolution へそのまま渡す引数（popsize, polish など）
+
+        Returns:
+            {'params', 'named', 'mse', 'mae_pct', 'pred', 'nfev', 'success'}
+        """
+        y = self.ln_m_obs if y is None else np.asarray(y, dtype=np.float64)
+        if workers == 1:
+            kwargs.setdefault("vectorized", True)
+        else:
+            kwargs["workers"] = workers
+        res = differential_evolution(self.objective, self.bounds, args=(y,), seed=seed, strategy=strategy,
+                                     maxiter=maxiter, tol=tol, updating="deferred", **kwargs)
+        return {
+            "params": res.x,
+            "named": dict(zip(self.param_names, res.x.tolist())),
+            "mse": float(res.fun),
+            "mae_pct": float(self.mae_pct(res.x, y)),
+            "pred": self.predict(res.x),
+            "nfev": int(res.nfev),
+            "success": bool(res.success),
+        }
@@ -0,0 +1,1004 @@
+"""
+ksau_search.py — KSAU トポロジー割り当て・定数探索エンジン
+
+Top-K に切り詰めたプールでの itertools.product や、nlargest(50) に絞った三重ループを
+置き換えるための共通部品。探索空間全体に対する厳密な最適解・順位を返すことを目的とする。
+
+    import ksau_search
+
+    # 質量順（Up, Down, Strange, Charm, Bottom, Top）の各クォークの候補体積と誤差[%]
+    result = ksau_search.exhaustive_assignment_search(volumes, errors, threshold=ksau_mae + 1e-4)
+    print(result["rank"], "of", result["n_total"])
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from math import comb
+
+import numpy as np
+import pandas as pd
+
+# 分枝限定法で一度に展開する部分割り当ての数（メモリ上限を決める）
+_EXPAND_CHUNK = 2_000_000
+
+# triplet_search() が一度に処理する先頭要素の数（(a, b) ペアのブロックの大きさを決める）
+_TRIPLET_BLOCK = 256
+
+# formula_search() の演算子コード（-, / は左右を入れ替えた組も作る）
+_FORMULA_OPS = ("+", "-", "*", "/")
+
+# 数値的に等価な式とみなす精度（float64 の仮数部の下位ビットを切り捨てる数。約 1e-12 相対）
+_FORMULA_HASH_SHIFT = 12
+
+# ボソン候補の Borromean 倍数判定に使う倍率（topology_official_selector.py と同じ並び・許容 5%）
+BORROMEAN_MULTIPLES = (1.0, 1.5, 2.0, 2.05, 2.16, 2.5, 3.0)
+BORROMEAN_TOLERANCE = 0.05
+
+# ボソン候補のスコア: Brunnian 加点 - 質量誤差の重み × 相対誤差 + Borromean 倍数の加点
+BOSON_SCORE_VARIANTS = {
+    "scalar": {"brunnian": 100.0, "mass_weight": 100.0, "borromean": 5.0},
+    "gauge": {"brunnian": 100.0, "mass_weight": 50.0, "borromean": 20.0},
+}
+
+# CKM の logit 幾何モデルの係数（archive/v6.1 の evaluate_assignment_constrained と同じ値）
+CKM_LOGIT_COEFFS = {"A": -6.3436, "B": 12.3988, "beta": -105.0351, "gamma": 1.1253, "C": 23.2475}
+
+# CKMScorer が前計算する (up 候補 × down 候補) の誤差表 1 枚あたりの要素数の上限
+_CKM_TABLE_LIMIT = 4_000_000
+
+# CKMScorer.sample() / exhaustive() が一度に評価する割り当ての数
+_CKM_CHUNK = 1_000_000
+
+# sign_rule_scan() が一度に処理する評価点の数
+_SIGN_SCAN_CHUNK = 256
+
+
+class _AssignmentTables:
+    """
+    各レベル（質量順の粒子）の候補を体積順に並べ、残りのレベルについての
+    最小・最大コストと有効な割り当て数を後ろから DP で求めた表。
+    """
+
+    def __init__(self, volumes, costs, ordered: bool):
+        self.order = [np.argsort(np.asarray(v, dtype=np.float64), kind="stable") for v in volumes]
+        self.vol = [np.asarray(v, dtype=np.float64)[o] for v, o in zip(volumes, self.order)]
+        self.cost = [np.asarray(c, dtype=np.float64)[o] for c, o in zip(costs, self.order)]
+        k = len(self.vol)
+
+        # start[j][i]: レベル j の候補 i の次に選べるレベル j+1 の候補の先頭位置
+        self.start = []
+        for j in range(k - 1):
+            if ordered:
+                self.start.append(np.searchsorted(self.vol[j + 1], self.vol[j], side="right"))
+            else:
+                self.start.append(np.zeros(len(self.vol[j]), dtype=np.int64))
+
+        # lb/ub[j][i]: レベル j で候補 i を選んだとき、レベル j+1 以降で足されるコストの最小・最大
+        # count[j][i]: その後に続く有効な割り当ての数（Python int で厳密に数える）
+        self.lb = [None] * k
+        self.ub = [None] * k
+        self.count = [None] * k
+        self.lb[-1] = np.zeros(len(self.vol[-1]))
+        self.ub[-1] = np.zeros(len(self.vol[-1]))
+        self.count[-1] = np.ones(len(self.vol[-1]), dtype=object)
+        for j in range(k - 2, -1, -1):
+            nxt_lo = self.cost[j + 1] + self.lb[j + 1]
+            nxt_hi = self.cost[j + 1] + self.ub[j + 1]
+            alive = np.array([c > 0 for c in self.count[j + 1]], dtype=bool)
+            suf_min = np.append(np.minimum.accumulate(np.where(alive, nxt_lo, np.inf)[::-1])[::-1], np.inf)
+            suf_max = np.append(np.maximum.accumulate(np.where(alive, nxt_hi, -np.inf)[::-1])[::-1], -np.inf)
+            suf_cnt = np.append(np.cumsum(self.count[j + 1][::-1])[::-1], 0).astype(object)
+            self.lb[j] = suf_min[self.start[j]]
+            self.ub[j] = suf_max[self.start[j]]
+            self.count[j] = suf_cnt[self.start[j]]
+
+        # 最後のレベルの「位置 >= start かつコスト <= r」の個数を数える merge sort tree。
+        # コストを順位に置き換え、各段でブロック番号 × (n + 1) + 順位 をキーとしてソートしておく。
+        n = len(self.cost[-1])
+        self.tail_sorted = np.sort(self.cost[-1])
+        rank = np.empty(n, dtype=np.int64)
+        rank[np.argsort(self.cost[-1], kind="stable")] = np.arange(n)
+        self.tail_keys = []
+        size = 1
+        while True:
+            self.tail_keys.append(np.sort((np.arange(n) // size) * (n + 1) + rank))
+            if size >= n:
+                break
+            size *= 2
+
+    def count_tail(self, start: np.ndarray, remaining: np.ndarray) -> int:
+        """最後のレベルで位置 >= start かつコスト <= remaining の候補数の合計を返す。"""
+        n = len(self.tail_sorted)
+        below = np.searchsorted(self.tail_sorted, remaining, side="right")
+        pos = np.asarray(start, dtype=np.int64).copy()
+        total = 0
+
+        def take(level, mask):
+            block = pos[mask] >> level
+            keys = self.tail_keys[level]
+            lo = np.searchsorted(keys, block * (n + 1))
+            hi = np.searchsorted(keys, block * (n + 1) + below[mask])
+            return int((hi - lo).sum())
+
+        # [start, n) を 2 冪に揃ったブロックに分解する
+        for level in range(len(self.tail_keys) - 1):
+            mask = ((pos >> level) & 1).astype(bool) & (pos < n)
+            if mask.any():
+                total += take(level, mask)
+                pos[mask] += 1 << level
+        mask = pos < n
+        if mask.any():
+            total += take(len(self.tail_keys) - 1, mask)
+        return total
+
+    def best(self):
+        """大域最適の (コスト和, 各レベルの候補位置 [体積順]) を返す。"""
+        total = self.cost[0] + self.lb[0]
+        i = int(np.argmin(total))
+        if not np.isfinite(total[i]):
+            return np.inf, None
+        path = [i]
+        for j in range(len(self.vol) - 1):
+            lo = self.start[j][path[-1]]
+            cand = self.cost[j + 1][lo:] + self.lb[j + 1][lo:]
+            path.append(lo + int(np.argmin(cand)))
+        return float(total[path[0]]), path
+
+
+def _count_below(tables: _AssignmentTables, level: int, partial: np.ndarray, idx: np.ndarray, limit: float) -> int:
+    """
+    レベル level の部分割り当て (partial: コスト和, idx: 候補位置) を根とする部分木のうち、
+    総コストが limit 以下の完全な割り当ての数を分枝限定法で数える。
+
+    下界が limit を超える部分木は捨て、上界が limit 以下の部分木は DP の個数をそのまま足す。
+    """
+    lo = partial + tables.lb[level][idx]
+    hi = partial + tables.ub[level][idx]
+    alive = tables.count[level][idx] != 0
+    accept = alive & (hi <= limit)
+    total = int(sum(tables.count[level][idx[accept]]))
+    expand = alive & ~accept & (lo <= limit)
+    if not expand.any():
+        return total
+
+    partial, idx = partial[expand], idx[expand]
+    start = tables.start[level][idx]
+    if level == len(tables.vol) - 2:
+        # 最後の粒子は展開せず、残り予算以下の候補を merge sort tree で数える
+        return total + tables.count_tail(start, limit - partial)
+
+    lengths = len(tables.vol[level + 1]) - start
+    # 展開後の大きさが _EXPAND_CHUNK を超えないように分割して深さ優先で処理する
+    csum = np.cumsum(lengths)
+    a = 0
+    while a < len(idx):
+        done = int(csum[a - 1]) if a else 0
+        b = max(int(np.searchsorted(csum, done + _EXPAND_CHUNK, side="right")), a + 1)
+        seg_len = lengths[a:b]
+        parent = np.repeat(np.arange(a, b), seg_len)
+        child = start[parent] + (np.arange(len(parent)) - np.repeat(np.cumsum(seg_len) - seg_len, seg_len))
+        total += _count_below(tables, level + 1, partial[parent] + tables.cost[level + 1][child], child, limit)
+        a = b
+    return total
+
+
+def _count_task(args) -> int:
+    tables, idx, limit = args
+    return _count_below(tables, 0, tables.cost[0][idx], idx, limit)
+
+
+def exhaustive_assignment_search(volumes, costs, threshold=None, ordered: bool = True, workers: int = 1) -> dict:
+    """
+    粒子ごとの候補プール全体に対する割り当て探索（全組合せの厳密な最適解と順位）。
+
+    目的関数は各粒子の候補コストの平均（例: 質量誤差[%] の平均 = MAE[%]）。
+    ordered=True なら体積が粒子の並び順（質量順）に狭義単調増加する割り当てだけを有効とする。
+    最適解は後ろからの DP で、順位（threshold 以下の割り当ての数）は
+    その DP の下界・上界・個数を使った分枝限定法で厳密に求める。
+
+    Args:
+        volumes: 粒子ごとの候補体積配列のリスト（質量順）
+        costs: volumes と同じ形の候補ごとのコスト配列のリスト
+        threshold: 平均コストがこの値以下の割り当てを数える（例: ksau_mae + 1e-4）。None なら数えない
+        ordered: 体積順 = 質量順の制約を課すか
+        workers: 2 以上なら最初の粒子の候補で部分木を分け、プロセスプールで数える
+
+    Returns:
+        {'best_score', 'best_indices'（各プール内の元の位置）, 'best_volumes',
+         'n_total'（有効な割り当ての総数）, 'rank', 'threshold'}
+    """
+    tables = _AssignmentTables(volumes, costs, ordered)
+    k = len(tables.vol)
+    best_sum, path = tables.best()
+    result = {
+        "best_score": best_sum / k,
+        "best_indices": None if path is None else [int(o[i]) for o, i in zip(tables.order, path)],
+        "best_volumes": None if path is None else [float(v[i]) for v, i in zip(tables.vol, path)],
+        "n_total": int(sum(tables.count[0])),
+        "rank": None,
+        "threshold": threshold,
+    }
+    if threshold is None:
+        return result
+
+    limit = threshold * k
+    roots = np.arange(len(tables.vol[0]))
+    if workers <= 1:
+        result["rank"] = _count_task((tables, roots, limit))
+    else:
+        tasks = [(tables, chunk, limit) for chunk in np.array_split(roots, workers * 4) if len(chunk)]
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            result["rank"] = int(sum(ex.map(_count_task, tasks)))
+    return result
+
+
+def _triplet_fit(d_small, d_large, targets):
+    """
+    距離の組 x = (d_small, d_large, d_small + d_large) を targets（昇順）に y = slope·x で当てはめ、
+    (slope, mse) を返す。pmns_improved_search.py の線形スケーリングと同じ式。
+    """
+    y0, y1, y2 = targets
+    x2 = d_small + d_large
+    xx = d_small * d_small + d_large * d_large + x2 * x2
+    xy = d_small * y0 + d_large * y1 + x2 * y2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(xx > 0, xy / xx, np.nan)
+        mse = np.where(xx > 0, (y0 * y0 + y1 * y1 + y2 * y2 - xy * slope) / 3.0, np.inf)
+    return slope, mse
+
+
+def _ratio_optimum(targets) -> float:
+    """mse を最小にする距離の比 ρ* ∈ [0, 1]（格子探索のあと黄金分割で詰める）。"""
+    def f(r):
+        return _triplet_fit(np.asarray(r, dtype=np.float64), np.float64(1.0), targets)[1]
+
+    grid = np.linspace(0.0, 1.0, 2049)
+    i = int(np.argmin(f(grid)))
+    lo, hi = grid[max(i - 1, 0)], grid[min(i + 1, len(grid) - 1)]
+    g = (np.sqrt(5.0) - 1.0) / 2.0
+    for _ in range(80):
+        m1, m2 = hi - g * (hi - lo), lo + g * (hi - lo)
+        lo, hi = (lo, m2) if f(m1) <= f(m2) else (m1, hi)
+    return float(0.5 * (lo + hi))
+
+
+def _ratio_interval(targets, tau: float, r_best: float) -> tuple[float, float]:
+    """
+    mse は距離の比 ρ = d_small / d_large ∈ [0, 1] だけで決まり、ρ について準凸。
+    mse(ρ) <= tau となる区間 [ρ_lo, ρ_hi] を ρ* から両側への二分法で求める。
+    """
+    def f(r):
+        return float(_triplet_fit(np.float64(r), np.float64(1.0), targets)[1])
+
+    if f(r_best) > tau:
+        return r_best, r_best
+
+    def edge(inside, outside):
+        for _ in range(60):
+            mid = 0.5 * (inside + outside)
+            inside, outside = (mid, outside) if f(mid) <= tau else (inside, mid)
+        return outside
+
+    lo = 0.0 if f(0.0) <= tau else edge(r_best, 0.0)
+    hi = 1.0 if f(1.0) <= tau else edge(r_best, 1.0)
+    return lo, hi
+
+
+def _pair_blocks(n: int, block: int):
+    """a < b の全ペアを先頭 a の block 個ずつに分けて (aa, bb) 配列で返すジェネレータ。"""
+    for a0 in range(0, n - 2, block):
+        a = np.arange(a0, min(a0 + block, n - 2))
+        lengths = n - 1 - a
+        aa = np.repeat(a, lengths)
+        bb = aa + 1 + (np.arange(len(aa)) - np.repeat(np.cumsum(lengths) - lengths, lengths))
+        yield aa, bb
+
+
+def _expand_ranges(owner, start, stop):
+    """各 owner について [start, stop) の位置を展開し (owner, position) を返す。"""
+    lengths = np.maximum(stop - start, 0)
+    rep = np.repeat(np.arange(len(owner)), lengths)
+    pos = start[rep] + (np.arange(len(rep)) - np.repeat(np.cumsum(lengths) - lengths, lengths))
+    return rep, pos
+
+
+def triplet_search(values, targets, top_k: int = 10, block: int = _TRIPLET_BLOCK) -> dict:
+    """
+    候補集合全体の C(n, 3) 個の三つ組について、指標値の差の線形スケーリング当てはめを評価する。
+
+    三つ組 (a, b, c) の距離 |m_a - m_b|, |m_b - m_c|, |m_a - m_c| を昇順に並べ、
+    昇順の targets に y = slope·x で当てはめた MSE が小さい上位 top_k 個を厳密に返す。
+
+    MSE は距離の比 ρ だけで決まり ρ について準凸なので、
+      1. 各ペア (a, b) について最適比に近い c だけを調べ、k 番目に良い値を閾値 τ とし、
+      2. mse <= τ となる ρ の区間から各ペアの c の範囲を二分探索で求めて展開する。
+    全三つ組を Python ループで回さずに済み、計算量は O(n² log n) になる。
+
+    Args:
+        values: 候補ごとの指標値（NaN は除外される）
+        targets: 3 つの目標値（例: PMNS 角 θ12, θ23, θ13）。内部で昇順に並べる
+        top_k: 返す三つ組の数
+
+    Returns:
+        {'top': DataFrame(i, j, k, d_small, d_mid, d_large, slope, mse; i, j, k は values の位置),
+         'n_candidates', 'n_triplets', 'tau'}
+    """
+    values = np.asarray(values, dtype=np.float64)
+    targets = np.sort(np.asarray(targets, dtype=np.float64))
+    valid = np.flatnonzero(np.isfinite(values))
+    order = valid[np.argsort(values[valid], kind="stable")]
+    v = values[order]
+    n = len(v)
+    empty = pd.DataFrame(columns=["i", "j", "k", "d_small", "d_mid", "d_large", "slope", "mse"])
+    if n < 3:
+        return {"top": empty, "n_candidates": n, "n_triplets": 0, "tau": None}
+
+    r_best = _ratio_optimum(targets)
+
+    # 1. 各ペアの近似最良値から閾値 τ（k 個以上の三つ組が τ 以下になる値）を決める
+    best = np.empty(0)
+    for aa, bb in _pair_blocks(n, block):
+        d1 = v[bb] - v[aa]
+        scores = np.full(len(aa), np.inf)
+        guesses = [v[bb] + d1 * r_best] + ([v[bb] + d1 / r_best] if r_best > 0 else [])
+        for guess in guesses:
+            pos = np.searchsorted(v, guess)
+            for c in (pos - 1, pos, bb + 1, np.full(len(bb), n - 1)):
+                c = np.clip(c, bb + 1, n - 1)
+                ok = c > bb
+                d2 = v[c] - v[bb]
+                mse = _triplet_fit(np.minimum(d1, d2), np.maximum(d1, d2), targets)[1]
+                scores = np.minimum(scores, np.where(ok, mse, np.inf))
+        best = np.concatenate([best, scores])
+        if len(best) > top_k:
+            best = np.partition(best, top_k - 1)[:top_k]
+    tau = float(np.max(best)) if len(best) >= top_k else np.inf
+    tau_cut = tau + 1e-12 * max(1.0, abs(tau)) if np.isfinite(tau) else np.inf
+
+    # 2. mse <= τ となる c の範囲だけを展開して厳密な上位 top_k を取る
+    if np.isfinite(tau):
+        r_lo, r_hi = _ratio_interval(targets, tau_cut, r_best)
+        r_lo, r_hi = max(r_lo - 1e-7, 0.0), min(r_hi + 1e-7, 1.0)
+    else:
+        r_lo, r_hi = 0.0, 1.0
+    keep = {"a": [], "b": [], "c": [], "mse": []}
+    for aa, bb in _pair_blocks(n, block):
+        d1 = v[bb] - v[aa]
+        # A: d2 <= d1（ρ = d2/d1）、B: d2 >= d1（ρ = d1/d2）
+        a_start = np.searchsorted(v, v[bb] + d1 * r_lo, side="left")
+        a_stop = np.searchsorted(v, v[bb] + d1 * r_hi, side="right")
+        with np.errstate(divide="ignore"):
+            b_lo = np.where(d1 > 0, d1 / r_hi, 0.0) if r_hi > 0 else np.full(len(d1), np.inf)
+            b_hi = np.where(d1 > 0, d1 / r_lo, np.inf) if r_lo > 0 else np.full(len(d1), np.inf)
+        b_start = np.searchsorted(v, v[bb] + b_lo, side="left")
+        b_stop = np.searchsorted(v, v[bb] + b_hi, side="right")
+        if r_lo > 0:
+            # d1 = 0 のペアは ρ = 0 にしかならないので除外する
+            b_stop = np.where(d1 > 0, b_stop, 0)
+        a_start = np.maximum(a_start, bb + 1)
+        a_stop = np.maximum(a_stop, a_start)
+        b_start = np.maximum(np.maximum(b_start, bb + 1), a_stop)
+
+        for start, stop in ((a_start, a_stop), (b_start, b_stop)):
+            rep, c = _expand_ranges(aa, start, stop)
+            if len(c) == 0:
+                continue
+            a, b = aa[rep], bb[rep]
+            d_1, d_2 = v[b] - v[a], v[c] - v[b]
+            mse = _triplet_fit(np.minimum(d_1, d_2), np.maximum(d_1, d_2), targets)[1]
+            hit = mse <= tau_cut
+            for key, arr in zip(("a", "b", "c", "mse"), (a, b, c, mse)):
+                keep[key].append(arr[hit])
+
+        if keep["mse"]:
+            merged = {key: np.concatenate(arrs) for key, arrs in keep.items()}
+            if len(merged["mse"]) > top_k:
+                sel = np.argpartition(merged["mse"], top_k - 1)[:top_k]
+                merged = {key: arr[sel] for key, arr in merged.items()}
+            keep = {key: [arr] for key, arr in merged.items()}
+
+    if not keep["mse"]:
+        return {"top": empty, "n_candidates": n, "n_triplets": comb(n, 3), "tau": tau}
+    res = {key: np.concatenate(arrs) for key, arrs in keep.items()}
+    sel = np.lexsort((res["c"], res["b"], res["a"], res["mse"]))[:top_k]
+    a, b, c = res["a"][sel], res["b"][sel], res["c"][sel]
+    d_1, d_2 = v[b] - v[a], v[c] - v[b]
+    d_small, d_mid = np.minimum(d_1, d_2), np.maximum(d_1, d_2)
+    slope, mse = _triplet_fit(d_small, d_mid, targets)
+    top = pd.DataFrame({
+        "i": order[a], "j": order[b], "k": order[c],
+        "d_small": d_small, "d_mid": d_mid, "d_large": d_small + d_mid,
+        "slope": slope, "mse": mse,
+    })
+    return {"top": top, "n_candidates": n, "n_triplets": comb(n, 3), "tau": tau}
+
+
+def triplet_search_multi(df: pd.DataFrame, metrics, targets, top_k: int = 10, name_col: str = "name") -> dict:
+    """
+    複数の指標列それぞれについて triplet_search() を行い、{指標名: 結果} を返す。
+
+    従来どおり指標値が正の行だけを候補とし、結果の 'top' には name_1〜name_3 列を付ける。
+    """
+    results = {}
+    for metric in metrics:
+        values = pd.to_numeric(df[metric], errors="coerce").to_numpy(dtype=np.float64)
+        values = np.where(values > 0, values, np.nan)
+        res = triplet_search(values, targets, top_k=top_k)
+        top = res["top"]
+        if name_col in df.columns and len(top):
+            names = df[name_col].to_numpy()
+            for col, pos in (("name_1", "i"), ("name_2", "j"), ("name_3", "k")):
+                top[col] = names[top[pos].to_numpy(dtype=np.int64)]
+        results[metric] = res
+    return results
+
+
+def _formula_keys(values: np.ndarray) -> np.ndarray:
+    """式の値の float64 ビット列から下位ビットを落とした重複判定用のハッシュ。"""
+    return (np.asarray(values, dtype=np.float64) + 0.0).view(np.int64) >> _FORMULA_HASH_SHIFT
+
+
+def _formula_combine(op: str, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        if op == "+":
+            return a + b
+        if op == "-":
+            return a - b
+        if op == "*":
+            return a * b
+        return np.where(b != 0, a / np.where(b != 0, b, 1.0), np.nan)
+
+
+def _formula_window(op: str, a: np.ndarray, lo: float, hi: float, swapped: bool):
+    """
+    a (op) b ∈ [lo, hi]（swapped なら b (op) a）となる b の区間を a ごとに返す。
+    区間が求まらない a（0 での割り算など）は空区間 (inf, -inf) にする。
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if op == "+":
+            b_lo, b_hi = lo - a, hi - a
+        elif op == "-":
+            b_lo, b_hi = (lo + a, hi + a) if swapped else (a - hi, a - lo)
+        elif op == "*":
+            b_lo, b_hi = lo / a, hi / a
+        elif swapped:
+            b_lo, b_hi = lo * a, hi * a
+        elif lo > 0 or hi < 0:
+            b_lo, b_hi = a / hi, a / lo
+        else:
+            # 目標区間が 0 をまたぐと a / b の逆像は有界でないので、この演算は調べない
+            return np.full(len(a), np.inf), np.full(len(a), -np.inf)
+    b_lo, b_hi = np.minimum(b_lo, b_hi), np.maximum(b_lo, b_hi)
+    bad = ~(np.isfinite(b_lo) & np.isfinite(b_hi)) | ((op == "*") & (a == 0))
+    b_lo, b_hi = np.where(bad, np.inf, b_lo), np.where(bad, -np.inf, b_hi)
+    pad = np.where(bad, 0.0, 1e-12 * np.maximum(np.abs(b_lo), np.abs(b_hi)))
+    return b_lo - pad, b_hi + pad
+
+
+def _formula_atoms(constants: dict, max_numerator: int, max_denominator: int) -> dict:
+    """定数と小さな有理数 n/m を葉（複雑度 1）の式として並べる。"""
+    names = list(constants)
+    values = [float(constants[k]) for k in names]
+    fracs = sorted({Fraction(n, m) for n in range(1, max_numerator + 1) for m in range(1, max_denominator + 1)})
+    names += [str(f) for f in fracs]
+    values += [float(f) for f in fracs]
+    return {"values": np.array(values, dtype=np.float64), "names": names}
+
+
+def _formula_splits(leaves: int):
+    """葉の数 leaves の式を作る (左の葉数, 右の葉数) の組（左 <= 右）。"""
+    return [(i, leaves - i) for i in range(1, leaves // 2 + 1)]
+
+
+def _formula_level(levels: list, leaves: int, seen: np.ndarray, max_size: int) -> tuple[dict, int]:
+    """
+    葉の数が leaves の式を、より少ない葉の式の組み合わせから幅優先で作る。
+    それまでに現れた値（seen）と同じ値になる式は捨て、最初に現れた式だけを残す。
+    """
+    parts = {key: [] for key in ("values", "keys", "op", "left_level", "left", "right_level", "right")}
+    n_tried = 0
+    for i, j in _formula_splits(leaves):
+        va, vb = levels[i]["values"], levels[j]["values"]
+        step = max(1, _EXPAND_CHUNK // max(len(vb), 1))
+        for a0 in range(0, len(va), step):
+            ia = np.arange(a0, min(a0 + step, len(va)))
+            aa = np.repeat(ia, len(vb))
+            bb = np.tile(np.arange(len(vb)), len(ia))
+            for code, op in enumerate(_FORMULA_OPS):
+                orders = ((False, True) if op in "-/" else (False,))
+                for swapped in orders:
+                    left, right = (bb, aa) if swapped else (aa, bb)
+                    ll, rl = (j, i) if swapped else (i, j)
+                    vals = _formula_combine(op, levels[ll]["values"][left], levels[rl]["values"][right])
+                    n_tried += len(vals)
+                    keys = _formula_keys(vals)
+                    ok = np.isfinite(vals)
+                    pos = np.searchsorted(seen, keys)
+                    ok &= ~(seen[np.minimum(pos, len(seen) - 1)] == keys) if len(seen) else ok
+                    keys, first = np.unique(keys[ok], return_index=True)
+                    sel = np.flatnonzero(ok)[first]
+                    parts["values"].append(vals[sel])
+                    parts["keys"].append(keys)
+                    parts["op"].append(np.full(len(sel), code, dtype=np.int8))
+                    parts["left_level"].append(np.full(len(sel), ll, dtype=np.int8))
+                    parts["left"].append(left[sel])
+                    parts["right_level"].append(np.full(len(sel), rl, dtype=np.int8))
+                    parts["right"].append(right[sel])
+            if sum(len(v) for v in parts["values"]) > 4 * max_size:
+                raise ValueError(f"葉 {leaves} 個の式が多すぎます（max_level_size={max_size}）。"
+                                 f"max_leaves か定数・有理数の数を減らしてください")
+
+    level = {key: np.concatenate(arrs) for key, arrs in parts.items()}
+    keys, first = np.unique(level["keys"], return_index=True)
+    first = np.sort(first)
+    level = {key: arr[first] for key, arr in level.items()}
+    if len(level["values"]) > max_size:
+        raise ValueError(f"葉 {leaves} 個の式が多すぎます（{len(level['values'])} > max_level_size={max_size}）")
+    return level, n_tried
+
+
+def _formula_string(levels: list, leaves: int, idx: int, top: bool = True) -> str:
+    """幅優先で作った式の由来をたどって文字列に戻す。"""
+    level = levels[leaves]
+    if leaves == 1:
+        name = level["names"][idx]
+        return f"({name})" if not top and "/" in name else name
+    op = _FORMULA_OPS[level["op"][idx]]
+    left = _formula_string(levels, int(level["left_level"][idx]), int(level["left"][idx]), False)
+    right = _formula_string(levels, int(level["right_level"][idx]), int(level["right"][idx]), False)
+    return f"{left} {op} {right}" if top else f"({left} {op} {right})"
+
+
+def formula_search(target: float, constants: dict, tolerance: float, max_leaves: int = 4,
+                   max_numerator: int = 6, max_denominator: int = 6,
+                   max_level_size: int = 20_000_000) -> dict:
+    """
+    定数・小さな有理数と四則演算からなる式で target ± tolerance に入るものを、複雑度（葉の数）順に探す。
+
+    search_constants.py の「定数 × n/m」「定数 op 定数」の手書き二重ループを一般化したもの。
+      - 葉の数 1, 2, ... の式を幅優先で作り、float64 値のハッシュで数値的に等価な式を 1 つにまとめる
+        （最初に現れた = 最も簡単な式だけが残るので、同じ値の言い換えを何度も数えない）
+      - 最後の段（葉の数 max_leaves）は保存せず、左の式 a ごとに a op b が目標区間に入る
+        b の区間を求め、値で並べた右側の式を二分探索する（区間による枝刈り）
+
+    Args:
+        target: 目標値（例: γ = 1.3079, |B'| = 7.9159）
+        constants: {名前: 値}（例: {'pi': np.pi, 'G': 0.9159..., 'phi': ..., 'zeta3': ...}）
+        tolerance: 許容する絶対誤差
+        max_leaves: 式に使う葉（定数・有理数）の最大数
+        max_numerator, max_denominator: 葉として使う有理数 n/m の範囲
+        max_level_size: 保存する 1 段あたりの式の数の上限（超えると ValueError）
+
+    Returns:
+        {'matches': DataFrame(expr, value, error, leaves; 葉の数 → 誤差の順),
+         'n_tried': 評価した式の総数（重複を含む。Look-Elsewhere 補正用）,
+         'n_distinct': 段ごとの数値的に異なる式の数（最後の段は調べた組の数）}
+    """
+    lo, hi = target - tolerance, target + tolerance
+    levels = [None, _formula_atoms(constants, max_numerator, max_denominator)]
+    atoms = levels[1]
+    atoms["keys"] = _formula_keys(atoms["values"])
+    keys, first = np.unique(atoms["keys"], return_index=True)
+    first = np.sort(first)
+    atoms["values"], atoms["keys"] = atoms["values"][first], atoms["keys"][first]
+    atoms["names"] = [atoms["names"][i] for i in first]
+    seen = np.sort(atoms["keys"])
+
+    n_tried = len(atoms["values"])
+    n_distinct = {1: len(atoms["values"])}
+    hits = []
+    hit = np.abs(atoms["values"] - target) <= tolerance
+    hits += [(atoms["names"][i], atoms["values"][i], 1) for i in np.flatnonzero(hit)]
+
+    for leaves in range(2, max_leaves):
+        level, tried = _formula_level(levels, leaves, seen, max_level_size)
+        levels.append(level)
+        n_tried += tried
+        n_distinct[leaves] = len(level["values"])
+        seen = np.union1d(seen, level["keys"])
+        hit = np.abs(level["values"] - target) <= tolerance
+        hits += [(_formula_string(levels, leaves, i), level["values"][i], leaves) for i in np.flatnonzero(hit)]
+
+    if max_leaves >= 2:
+        # 最後の段: a op b ∈ [lo, hi] となる b を値の区間から二分探索する
+        found_keys, final = [], []
+        tried = 0
+        for i, j in _formula_splits(max_leaves):
+            va = levels[i]["values"]
+            order = np.argsort(levels[j]["values"], kind="stable")
+            vb = levels[j]["values"][order]
+            for op in _FORMULA_OPS:
+                orders = ((False, True) if op in "-/" else (False,))
+                if i == j and op in "+*":
+                    tried += len(va) * (len(va) + 1) // 2
+                else:
+                    tried += len(va) * len(vb) * len(orders)
+                for swapped in orders:
+                    b_lo, b_hi = _formula_window(op, va, lo, hi, swapped)
+                    start = np.searchsorted(vb, b_lo, side="left")
+                    stop = np.maximum(np.searchsorted(vb, b_hi, side="right"), start)
+                    rep, pos = _expand_ranges(va, start, stop)
+                    if len(pos) == 0:
+                        continue
+                    a_vals, b_vals = va[rep], vb[pos]
+                    vals = _formula_combine(op, b_vals, a_vals) if swapped else _formula_combine(op, a_vals, b_vals)
+                    ok = np.abs(vals - target) <= tolerance
+                    for a_idx, b_idx, val in zip(rep[ok], order[pos[ok]], vals[ok]):
+                        sides = [(j, b_idx), (i, a_idx)] if swapped else [(i, a_idx), (j, b_idx)]
+                        final.append((op, sides, val))
+        n_tried += tried
+        n_distinct[max_leaves] = tried
+        keys = _formula_keys(np.array([val for _, _, val in final], dtype=np.float64))
+        known = set(seen[np.isin(seen, keys)].tolist())
+        for (op, sides, val), key in zip(final, keys.tolist()):
+            if key in known:
+                continue
+            known.add(key)
+            (ll, li), (rl, ri) = sides
+            left = _formula_string(levels, ll, int(li), False)
+            right = _formula_string(levels, rl, int(ri), False)
+            hits.append((f"{left} {op} {right}", float(val), max_leaves))
+
+    matches = pd.DataFrame(hits, columns=["expr", "value", "leaves"])
+    matches.insert(2, "error", (matches["value"] - target).abs())
+    matches = matches.sort_values(["leaves", "error"], kind="stable").reset_index(drop=True)
+    return {"matches": matches, "n_tried": int(n_tried), "n_distinct": n_distinct}
+
+
+def brunnian_mask(linking_matrix) -> np.ndarray:
+    """
+    linking_matrix 列の文字列から「絡み数がすべて 0」の行を判定する（正規表現の列演算で一括処理）。
+    数を 1 つも含まない行は False（re.findall で判定していた従来の select_boson_fast と同じ）。
+    """
+    lm = pd.Series(linking_matrix).astype("string").fillna("")
+    has_number = lm.str.contains(r"\d", regex=True)
+    # "0" 以外のトークン（1-9 を含む、2 桁以上、負号付き）が 1 つでもあれば Brunnian ではない
+    nonzero = lm.str.contains(r"[1-9]|\d\d|-\d", regex=True)
+    return (has_number & ~nonzero).to_numpy(dtype=bool)
+
+
+def borromean_multiple(volumes, v_borromean: float) -> np.ndarray:
+    """体積が BORROMEAN_MULTIPLES の何倍の V_borromean に 5% 以内で一致するか（最初の一致、無ければ NaN）。"""
+    volumes = np.asarray(volumes, dtype=np.float64)
+    expected = np.asarray(BORROMEAN_MULTIPLES) * v_borromean
+    close = np.abs(volumes[:, None] - expected[None, :]) / expected[None, :] < BORROMEAN_TOLERANCE
+    first = np.argmax(close, axis=1)
+    return np.where(close.any(axis=1), np.asarray(BORROMEAN_MULTIPLES)[first], np.nan)
+
+
+def score_boson_candidates(links: pd.DataFrame, observed_mass: float, A: float, C: float,
+                           v_borromean: float, components: int, volume_window,
+                           variants=None, is_brunnian=None) -> pd.DataFrame:
+    """
+    LinkInfo の候補全体をボソン質量に対して列演算でスコア付けし、順位表を返す。
+
+    Args:
+        links: name, volume, components（あれば determinant, linking_matrix）を持つ表
+        observed_mass: 観測質量 [MeV]
+        A, C: ボソンのスケーリング ln(m) = A·V + C
+        v_borromean: Borromean 環の体積
+        components: 要求する成分数
+        volume_window: 目標体積 (ln m - C) / A からの許容幅（float なら ±、(下, 上) の組も可）
+        variants: {名前: {'brunnian', 'mass_weight', 'borromean'}}（既定は BOSON_SCORE_VARIANTS）
+        is_brunnian: 事前計算した Brunnian 判定（links と同じ長さ。例: SSOT.linking_store()['is_brunnian']）。
+                     None なら linking_matrix から求める
+
+    Returns:
+        name, volume, components, determinant, is_brunnian, borr_mult, mass_error_pct と
+        variant ごとの score_<名前> 列を持つ表（最初の variant のスコア降順、同点は名前順）
+    """
+    variants = BOSON_SCORE_VARIANTS if variants is None else variants
+    v_target = (np.log(observed_mass) - C) / A
+    lo, hi = (v_target - volume_window, v_target + volume_window) if np.isscalar(volume_window) \
+        else (v_target + volume_window[0], v_target + volume_window[1])
+
+    volume = pd.to_numeric(links["volume"], errors="coerce").to_numpy(dtype=np.float64)
+    comps = pd.to_numeric(links["components"], errors="coerce").to_numpy(dtype=np.float64)
+    keep = (volume >= lo) & (volume <= hi) & (comps == components)
+    if not keep.any():
+        raise ValueError(f"No suitable candidates found in volume range ({lo:.4f}, {hi:.4f})")
+
+    if is_brunnian is None:
+        lm = links["linking_matrix"] if "linking_matrix" in links.columns else pd.Series("", index=links.index)
+        brunnian = brunnian_mask(lm.to_numpy()[keep])
+    else:
+        brunnian = np.asarray(is_brunnian, dtype=bool)[keep]
+    v = volume[keep]
+    borr_mult = borromean_multiple(v, v_borromean)
+    mass_error = np.abs(np.exp(A * v + C) - observed_mass) / observed_mass
+
+    if "determinant" in links.columns:
+        det = pd.to_numeric(links["determinant"], errors="coerce").to_numpy(dtype=np.float64)[keep]
+    else:
+        det = np.zeros(len(v))
+    table = pd.DataFrame({
+        "name": links["name"].to_numpy()[keep],
+        "volume": v,
+        "components": comps[keep].astype(np.int64),
+        "determinant": np.nan_to_num(det).astype(np.int64),
+        "is_brunnian": brunnian,
+        "borr_mult": borr_mult,
+        "mass_error_pct": mass_error * 100,
+    })
+    for name, w in variants.items():
+        table[f"score_{name}"] = (np.where(brunnian, w["brunnian"], 0.0) - w["mass_weight"] * mass_error
+                                  + np.where(np.isnan(borr_mult), 0.0, w["borromean"]))
+    primary = f"score_{next(iter(variants))}"
+    return table.sort_values([primary, "name"], ascending=[False, True], kind="stable").reset_index(drop=True)
+
+
+def select_boson(boson_name: str, links: pd.DataFrame, consts: dict, is_brunnian=None, variants=None) -> pd.DataFrame:
+    """
+    SSOT 定数を使って score_boson_candidates() を呼ぶ。従来の select_boson_fast と同じ規則で、
+    Higgs は 2 成分・±1.0、W/Z は 3 成分・±0.5 の体積窓を使い、スコアは scalar / gauge の順に並べる。
+    返り値の先頭行が従来の選択結果になる。
+    """
+    scaling = consts["scaling_laws"]["boson_scaling"]
+    observed_mass = consts["particle_data"]["bosons"][boson_name]["observed_mass"]
+    is_higgs = boson_name == "Higgs"
+    if variants is None:
+        order = ("scalar", "gauge") if is_higgs else ("gauge", "scalar")
+        variants = {k: BOSON_SCORE_VARIANTS[k] for k in order}
+    return score_boson_candidates(
+        links, observed_mass, scaling["A"], scaling["C"],
+        consts["topology_constants"]["v_borromean"],
+        components=2 if is_higgs else 3,
+        volume_window=1.0 if is_higgs else 0.5,
+        variants=variants, is_brunnian=is_brunnian,
+    )
+
+
+def ckm_features(volumes, jones_values) -> tuple[np.ndarray, np.ndarray]:
+    """候補ごとの (V, ln|J(ζ5)|) を返す。|J| は従来どおり 1e-10 で下から抑える。"""
+    v = np.asarray(volumes, dtype=np.float64)
+    ln_j = np.log(np.maximum(1e-10, np.abs(np.asarray(jones_values))))
+    return v, ln_j
+
+
+class CKMScorer:
+    """
+    6 クォークの割り当て (up1, up2, up3, down1, down2, down3) を CKM の logit 幾何モデルの R² で
+    まとめて採点する。
+
+    logit モデルの予測 |V_ij| は (up_i, down_j) の組の (V, ln|J|) だけで決まるので、
+    9 つの組ごとに (up 候補 × down 候補) の二乗誤差表を一度だけ作り、割り当ての採点は
+    表からの 9 回の取り出しと和になる（表が大きすぎる組はその場で計算する）。
+    体積の順序制約 Up < Down < Strange < Charm < Bottom < Top は採点前のマスクとして掛け、
+    違反した割り当ての R² は -inf にする（exhaustive() は制約を満たす割り当てだけを列挙する）。
+    """
+
+    # 体積が小さい順のスロット番号（0-2: Up, Charm, Top、3-5: Down, Strange, Bottom）
+    MASS_ORDER = (0, 3, 4, 1, 5, 2)
+
+    def __init__(self, up_pools, down_pools, ckm_obs, coeffs=None, ordered: bool = True):
+        """
+        Args:
+            up_pools: Up, Charm, Top の候補の (volumes, ln_j) の組 3 つ（ckm_features() の返り値）
+            down_pools: Down, Strange, Bottom の候補の (volumes, ln_j) の組 3 つ
+            ckm_obs: 観測 |V_ij| の 3×3 行列（行 = up、列 = down）
+            coeffs: logit モデルの係数（既定は CKM_LOGIT_COEFFS）
+            ordered: 体積の順序制約を掛けるか
+        """
+        self.pools = [tuple(np.asarray(a, dtype=np.float64) for a in p) for p in (*up_pools, *down_pools)]
+        self.sizes = np.array([len(p[0]) for p in self.pools], dtype=np.int64)
+        self.obs = np.asarray(ckm_obs, dtype=np.float64)
+        self.coeffs = dict(CKM_LOGIT_COEFFS if coeffs is None else coeffs)
+        self.ordered = ordered
+        self.sst = float(((self.obs - self.obs.mean()) ** 2).sum())
+        self._tables = {}
+        for i in range(3):
+            for j in range(3):
+                if self.sizes[i] * self.sizes[3 + j] <= _CKM_TABLE_LIMIT:
+                    vu, lu = self.pools[i]
+                    vd, ld = self.pools[3 + j]
+                    pred = self._logit(vu[:, None], lu[:, None], vd[None, :], ld[None, :])
+                    self._tables[i, j] = (self.obs[i, j] - pred) ** 2
+
+    def _logit(self, vu, lu, vd, ld) -> np.ndarray:
+        c = self.coeffs
+        dv = np.abs(vu - vd)
+        dl = np.abs(lu - ld)
+        z = c["C"] + c["A"] * dv + c["B"] * dl + c["beta"] / ((vu + vd) / 2.0) + c["gamma"] * dv * dl
+        return 1.0 / (1.0 + np.exp(-z))
+
+    def predict(self, idx) -> np.ndarray:
+        """割り当て (m, 6) ごとの予測 |V_ij|（(m, 3, 3)）。"""
+        idx = np.asarray(idx, dtype=np.int64)
+        vu = np.stack([self.pools[i][0][idx[:, i]] for i in range(3)], axis=1)
+        lu = np.stack([self.pools[i][1][idx[:, i]] for i in range(3)], axis=1)
+        vd = np.stack([self.pools[3 + j][0][idx[:, 3 + j]] for j in range(3)], axis=1)
+        ld = np.stack([self.pools[3 + j][1][idx[:, 3 + j]] for j in range(3)], axis=1)
+        return self._logit(vu[:, :, None], lu[:, :, None], vd[:, None, :], ld[:, None, :])
+
+    def valid(self, idx) -> np.ndarray:
+        """体積の順序制約を満たす割り当ての真偽値（ordered=False なら全て True）。"""
+        idx = np.asarray(idx, dtype=np.int64)
+        ok = np.ones(len(idx), dtype=bool)
+        if self.ordered:
+            vols = [self.pools[k][0][idx[:, k]] for k in self.MASS_ORDER]
+            for lo, hi in zip(vols[:-1], vols[1:]):
+                ok &= lo < hi
+        return ok
+
+    def score(self, idx) -> np.ndarray:
+        """割り当て (m, 6) ごとの R²（順序制約に違反したものは -inf）。"""
+        idx = np.asarray(idx, dtype=np.int64)
+        ok = self.valid(idx)
+        out = np.full(len(idx), -np.inf)
+        sub = idx[ok]
+        if len(sub) == 0:
+            return out
+        sse = np.zeros(len(sub))
+        missing = [(i, j) for i in range(3) for j in range(3) if (i, j) not in self._tables]
+        for (i, j), table in self._tables.items():
+            sse += table[sub[:, i], sub[:, 3 + j]]
+        if missing:
+            err = (self.obs[None] - self.predict(sub)) ** 2
+            for i, j in missing:
+                sse += err[:, i, j]
+        out[ok] = 1.0 - sse / self.sst
+        return out
+
+    def _best(self, best, idx, r2):
+        k = int(np.argmax(r2))
+        if np.isfinite(r2[k]) and (best[0] is None or r2[k] > best[0]):
+            return float(r2[k]), idx[k].copy()
+        return best
+
+    def sample(self, n_samples: int, seed: int = 42, chunk: int = _CKM_CHUNK) -> dict:
+        """
+        各プールから一様に独立に選んだ n_samples 個の割り当てを採点する（従来の DataFrame.sample(1) の試行）。
+
+        Returns:
+            {'best_r2', 'best_indices'(up1, up2, up3, down1, down2, down3), 'n_samples', 'n_valid'}
+        """
+        rng = np.random.default_rng(seed)
+        best = (None, None)
+        n_valid = 0
+        for a in range(0, n_samples, chunk):
+            m = min(chunk, n_samples - a)
+            idx = np.column_stack([rng.integers(0, s, m) for s in self.sizes])
+            r2 = self.score(idx)
+            n_valid += int(np.isfinite(r2).sum())
+            best = self._best(best, idx, r2)
+        return {"best_r2": best[0], "best_indices": best[1], "n_samples": int(n_samples), "n_valid": n_valid}
+
+    def exhaustive(self, chunk: int = _CKM_CHUNK) -> dict:
+        """
+        全ての割り当てを採点する。
+
+        ordered=True なら体積の順序制約を満たす割り当てだけを列挙する（各プールを体積順に並べ、
+        MASS_ORDER の次のスロットの候補の先頭を searchsorted で絞る）ので、Π|pool| ではなく
+        有効な割り当ての数に比例した時間で終わる。ordered=False なら Π|pool| 通りを順位の連番から
+        復元する（int64 に収まらない場合は ValueError）。
+
+        Returns:
+            {'best_r2', 'best_indices', 'n_total'(Π|pool|), 'n_valid'}
+        """
+        total = int(np.prod(self.sizes, dtype=object))
+        best = (None, None)
+        n_valid = 0
+        if self.ordered:
+            blocks = self._ordered_blocks(chunk)
+        else:
+            if total > np.iinfo(np.int64).max:
+                raise ValueError(f"Too many assignments to enumerate by rank: {total}")
+            blocks = (np.column_stack(np.unravel_index(np.arange(a, min(a + chunk, total), dtype=np.int64),
+                                                       tuple(self.sizes)))
+                      for a in range(0, total, chunk))
+        for idx in blocks:
+            r2 = self.score(idx)
+            n_valid += int(np.isfinite(r2).sum())
+            best = self._best(best, idx, r2)
+        return {"best_r2": best[0], "best_indices": best[1], "n_total": total, "n_valid": n_valid}
+
+    def _ordered_blocks(self, chunk: int):
+        """体積の順序制約を満たす割り当て (m, 6) を、おおむね chunk 行ずつ生成する。"""
+        order = [np.argsort(self.pools[k][0], kind="stable") for k in self.MASS_ORDER]
+        vols = [self.pools[k][0][o] for k, o in zip(self.MASS_ORDER, order)]
+        # completions[l][j]: レベル l（MASS_ORDER の l 番目）で体積順 j 番目を選んだあとの完成数
+        completions = [None] * 6
+        completions[5] = np.ones(len(vols[5]), dtype=np.float64)
+        for level in range(4, -1, -1):
+            nxt = np.searchsorted(vols[level + 1], vols[level], side="right")
+            suffix = np.concatenate([np.cumsum(completions[level + 1][::-1])[::-1], [0.0]])
+            completions[level] = suffix[nxt]
+        # 完成数が 0 の候補は体積順の末尾に並ぶので、各レベルの有効な候補は先頭 live[l] 個
+        live = [int(np.count_nonzero(c > 0)) for c in completions]
+        suffix = [np.concatenate([np.cumsum(c[::-1])[::-1], [0.0]]) for c in completions]
+
+        def expand(level, prefix, start, stop):
+            if level == 6:
+                idx = np.empty((len(prefix), 6), dtype=np.int64)
+                for l, k in enumerate(self.MASS_ORDER):
+                    idx[:, k] = order[l][prefix[:, l]]
+                yield idx
+                return
+            # 行ごとの完成数で、展開後の行数が chunk 程度になるように prefix を分ける
+            work = np.maximum(suffix[level][start] - suffix[level][stop], 0.0)
+            group = np.floor(np.cumsum(work) / max(chunk, 1)).astype(np.int64)
+            for rows in np.split(np.arange(len(group)), np.flatnonzero(np.diff(group)) + 1):
+                rep, pos = _expand_ranges(rows, start[rows], stop[rows])
+                if len(pos) == 0:
+                    continue
+                new = np.column_stack([prefix[rows][rep], pos]) if level else pos[:, None]
+                if level < 5:
+                    nxt_start = np.searchsorted(vols[level + 1], vols[level][pos], side="right")
+                    nxt_stop = np.full(len(pos), live[level + 1], dtype=np.int64)
+                else:
+                    nxt_start = nxt_stop = None
+                yield from expand(level + 1, new, nxt_start, nxt_stop)
+
+        yield from expand(0, np.empty((1, 0), dtype=np.int64), np.array([0]), np.array([live[0]]))
+
+
+def _gauge_signs() -> tuple[np.ndarray, np.ndarray]:
+    """
+    CKM の再位相変換 32 通りの行符号 (1, r2, r3) と列符号 (c1, c2, c3)。
+    並びは scan_eval_points.py の入れ子ループ（r2, r3, c1, c2, c3 の順に 1 → -1）と同じ。
+    """
+    pm = np.array([1, -1])
+    rows = np.array([[1, r2, r3] for r2 in pm for r3 in pm])
+    cols = np.array([[c1, c2, c3] for c1 in pm for c2 in pm for c3 in pm])
+    return rows, cols
+
+
+GAUGE_ROW_SIGNS, GAUGE_COL_SIGNS = _gauge_signs()
+
+# CKM 位相規則: (z_up, z_down) → 位相。callable を渡せば任意の規則も使える
+CKM_PHASE_RULES = {
+    "difference": lambda zu, zd: np.angle(zu - zd),
+    "sum": lambda zu, zd: np.angle(zu + zd),
+    "ratio": lambda zu, zd: np.angle(zu) - np.angle(zd),
+    "product": lambda zu, zd: np.angle(zu * zd),
+}
+
+
+def ckm_phase_signs(z_up, z_down, rule="difference") -> np.ndarray:
+    """
+    up 3 つ・down 3 つの複素値 (..., 3) から、位相規則 φ_ij の実部の符号 sign(cos φ_ij) (..., 3, 3) を返す。
+    """
+    fn = CKM_PHASE_RULES[rule] if isinstance(rule, str) else rule
+    phase = fn(np.asarray(z_up)[..., :, None], np.asarray(z_down)[..., None, :])
+    return np.sign(np.real(np.exp(1j * phase))).astype(np.int8)
+
+
+def sign_rule_scan(values, target_signs, rules=("difference",), chunk: int = _SIGN_SCAN_CHUNK) -> dict:
+    """
+    評価点 × 割り当て × 位相規則のすべてについて、32 通りの再位相変換のうち最良の符号一致数を求める。
+
+    符号 s_ij ∈ {-1, 0, 1} と目標 t_ij = ±1 から u_ij = s_ij t_ij を作ると、変換 (r, c) での一致数は
+    Σ_ij [u_ij r_i c_j = 1] = (Σ|u_ij| + rᵀ U c) / 2 なので、32 通りを 1 回の einsum で数えられる。
+
+    Args:
+        values: 複素値 (n_points, n_assignments, 6) または (n_points, 6)。
+            最後の軸は (Up, Charm, Top, Down, Strange, Bottom)。例えば
+            ksau_jones.jones_eval(store, x, positions, raw_exponents=True).T を並べ替えたもの
+        target_signs: 目標の符号行列 3×3（±1）
+        rules: CKM_PHASE_RULES の名前または callable の並び
+
+    Returns:
+        {'matches': (n_rules, n_points, n_assignments) int8 の最良一致数,
+         'transform': 同じ形の最良の変換番号（同点は最初のもの。GAUGE_ROW_SIGNS[t // 8], GAUGE_COL_SIGNS[t % 8]）,
+         'n_perfect': 規則ごとに 9/9 一致した (評価点, 割り当て) の数}
+    """
+    z = np.asarray(values, dtype=np.complex128)
+    if z.ndim == 2:
+        z = z[:, None, :]
+    target = np.asarray(target_signs, dtype=np.int8)
+    n_points, n_assign = z.shape[:2]
+    matches = np.empty((len(rules), n_points, n_assign), dtype=np.int8)
+    transform = np.empty((len(rules), n_points, n_assign), dtype=np.int8)
+    rows, cols = GAUGE_ROW_SIGNS.astype(np.int16), GAUGE_COL_SIGNS.astype(np.int16)
+    for k, rule in enumerate(rules):
+        for a in range(0, n_points, chunk):
+            block = z[a:a + chunk]
+            u = (ckm_phase_signs(block[..., :3], block[..., 3:], rule) * target).astype(np.int16)
+            nnz = np.abs(u).sum(axis=(-2, -1))
+            score = (nnz[..., None, None] + np.einsum("...ij,ri,cj->...rc", u, rows, cols)) // 2
+            flat = score.reshape(*score.shape[:-2], -1)
+            transform[k, a:a + chunk] = np.argmax(flat, axis=-1)
+            matches[k, a:a + chunk] = flat.max(axis=-1)
+    n_perfect = {(r if isinstance(r, str) else getattr(r, "__name__", str(i))): int((matches[i] == 9).sum())
+                 for i, r in enumerate(rules)}
+    return {"matches": matches, "transform": transform, "n_perfect": n_perfect}
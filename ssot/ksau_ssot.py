@@ -22,18 +22,30 @@ ksau_ssot.py — KSAU Project Single Source of Truth ローダー
 import json
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+import ksau_census
+import ksau_jones
+
 # このファイルが置かれている場所 = ssot/
 _SSOT_DIR = Path(__file__).parent
 
 # KnotInfo CSV は ssot/ の隣の data/ にある
 _DATA_DIR = _SSOT_DIR.parent / "data"
 
+# CSV から作ったバイナリ列キャッシュの置き場所（git 管理外）
+_CACHE_DIR = _DATA_DIR / "cache"
+
 
 class SSOT:
     """KSAU SSoT への読み取り専用アクセサ。"""
 
+    def __init__(self):
+        # lookup() 用にインスタンス内で使い回す索引と全列テーブル
+        self._name_index = None
+        self._tables = None
+
     def constants(self) -> dict:
         """ssot/constants.json を読み込んで返す。"""
         with open(_SSOT_DIR / "constants.json", encoding="utf-8") as f:
@@ -57,19 +69,178 @@ class SSOT:
         with open(_SSOT_DIR / "data" / "raw" / "topology_assignments.json", encoding="utf-8") as f:
             return json.load(f)
 
-    def knot_data(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+    def knot_data(self, columns=None, numeric: bool = False) -> tuple[pd.DataFrame, pd.DataFrame]:
         """
         KnotInfo / LinkInfo CSV を読み込んで (knots_df, links_df) を返す。
-        低メモリモードで読み込むため大規模データでも安全。
+        初回は CSV をパースして data/cache/ に列ごとのバイナリキャッシュを作り、
+        2 回目以降（CSV の内容ハッシュが同じ間）はキャッシュから読み込む。
+
+        Args:
+            columns: 返す列名のリスト。省略時は全列（numeric=True なら
+                     name, volume, crossing_number, determinant, signature, components）。
+                     片方のテーブルにしか無い列はもう片方では NaN 列になる。
+            numeric: True なら name 以外の列を float64 / int32 に変換して返す。
+                     "undefined", "Not Hyperbolic", "D.N.E.", "N/A" などは NaN になる。
+
+        例: knots_df, links_df = ssot.knot_data(columns=['name', 'volume', 'determinant'], numeric=True)
+
+        Raises:
+            KeyError: columns の列がどちらのテーブルにも存在しない場合
         """
         knot_path = _DATA_DIR / "knotinfo_data_complete.csv"
         link_path = _DATA_DIR / "linkinfo_data_complete.csv"
 
-        knots_df = pd.read_csv(knot_path, sep='|', skiprows=[1], low_memory=False) if knot_path.exists() else pd.DataFrame()
-        links_df = pd.read_csv(link_path, sep='|', skiprows=[1], low_memory=False) if link_path.exists() else pd.DataFrame()
+        if numeric and columns is None:
+            columns = ksau_census.CORE_NUMERIC_COLUMNS
+        if columns is not None:
+            columns = list(columns)
+
+        knots_df = ksau_census.load_table(knot_path, _CACHE_DIR, columns) if knot_path.exists() else pd.DataFrame()
+        links_df = ksau_census.load_table(link_path, _CACHE_DIR, columns) if link_path.exists() else pd.DataFrame()
+
+        if columns is not None and (knot_path.exists() or link_path.exists()):
+            missing = [c for c in columns
+                       if c not in knots_df.columns and c not in links_df.columns and c != "components"]
+            if missing:
+                raise KeyError(f"Columns not found in KnotInfo/LinkInfo: {missing}")
+            if knot_path.exists():
+                knots_df = ksau_census.project(knots_df, columns, numeric, is_knot=True)
+            if link_path.exists():
+                links_df = ksau_census.project(links_df, columns, numeric)
 
         return knots_df, links_df
 
+    def lookup(self, name: str) -> tuple[bool, pd.Series]:
+        """
+        結び目・絡み目の名前から (is_link, row) を O(1) で返す。row は knot_data() の 1 行。
+
+        "L6a4{0,1}" のような向き付け付きの名前は完全一致で、
+        "L6a4" のような基底名は最初の向き付けの行に解決される。
+        "L" が名前に含まれるかで KnotInfo / LinkInfo を推測する必要はない。
+
+        Raises:
+            KeyError: KnotInfo / LinkInfo のどちらにも見つからない場合
+        """
+        hit = self.name_index().resolve(name)
+        if hit is None:
+            raise KeyError(f"Topology not found in KnotInfo/LinkInfo: {name}")
+        table, row = hit
+        if self._tables is None:
+            self._tables = self.knot_data()
+        return bool(table), self._tables[table].iloc[row]
+
+    def lookup_many(self, names, columns=None, numeric: bool = False) -> pd.DataFrame:
+        """
+        複数の名前をまとめて解決し、names と同じ順の DataFrame を返す。
+
+        先頭に query（渡された名前）と is_link 列が付き、残りは knot_data(columns, numeric) の列。
+        見つからなかった名前の行は is_link を含め NaN になる。
+        """
+        names = list(names)
+        table, row = self.name_index().resolve_many(names)
+        if columns is None and not numeric:
+            if self._tables is None:
+                self._tables = self.knot_data()
+            tables = self._tables
+        else:
+            tables = self.knot_data(columns, numeric)
+
+        parts = []
+        for t, df in enumerate(tables):
+            pos = np.flatnonzero(table == t)
+            if len(pos):
+                part = df.iloc[row[pos]].copy()
+                part.index = pos
+                part.insert(0, "is_link", bool(t))
+                parts.append(part)
+        out = pd.concat(parts) if parts else pd.DataFrame(columns=["is_link"])
+        out = out.reindex(range(len(names)))
+        out.insert(0, "query", names)
+        return out
+
+    def name_index(self) -> ksau_census.NameIndex:
+        """lookup() が使う名前索引（インスタンス内で一度だけ構築）を返す。"""
+        if self._name_index is None:
+            knots_df, links_df = self.knot_data(columns=["name"]) if self._tables is None else self._tables
+            self._name_index = ksau_census.NameIndex(
+                knots_df["name"].tolist() if "name" in knots_df.columns else [],
+                links_df["name"].tolist() if "name" in links_df.columns else [],
+            )
+        return self._name_index
+
+    def invariant_matrix(self) -> ksau_census.InvariantMatrix:
+        """
+        双曲的な結び目・絡み目（volume > 0）の数値不変量を memmap の共有行列として返す。
+
+        列は volume, crossing_number, determinant, signature, components,
+        unknotting_number（LinkInfo は unlinking_number）, chern_simons_invariant。
+        並列ワーカーには inv.path を渡し、ksau_census.InvariantMatrix(path) で開けば
+        全プロセスで同じページを共有する（コピーは発生しない）。
+        """
+        knot_path = _DATA_DIR / "knotinfo_data_complete.csv"
+        link_path = _DATA_DIR / "linkinfo_data_complete.csv"
+        return ksau_census.InvariantMatrix(ksau_census.invariant_matrix_dir(knot_path, link_path, _CACHE_DIR))
+
+    def linking_store(self) -> ksau_census.LinkingStore:
+        """
+        LinkInfo の linking_matrix を int8 の CSR 形式で返す（初回に一度だけパースして data/cache/linking/ に保存）。
+
+        絡み目ごとの特徴量 is_brunnian, lk_total, lk_max_abs, lk_graph_components, lk_split は
+        store['is_brunnian'] のような LinkInfo の行順の配列として使える（文字列処理は不要）。
+        例: store = ssot.linking_store(); brunnian = links_df[np.asarray(store['is_brunnian'])]
+        """
+        knot_path = _DATA_DIR / "knotinfo_data_complete.csv"
+        link_path = _DATA_DIR / "linkinfo_data_complete.csv"
+        return ksau_census.LinkingStore(ksau_census.linking_store_dir(knot_path, link_path, _CACHE_DIR))
+
+    def torsion_store(self) -> ksau_census.TorsionStore:
+        """
+        KnotInfo の torsion_numbers をパース済みの形で返す（初回に一度だけパースして data/cache/torsion/ に保存）。
+
+        min_torsion(n), ln_st(n), torsion_rank(n) は KnotInfo の行順の配列で、knots_df と行で揃う。
+        例: knots_df['ln_st'] = ssot.torsion_store().ln_st(2)
+        """
+        knot_path = _DATA_DIR / "knotinfo_data_complete.csv"
+        link_path = _DATA_DIR / "linkinfo_data_complete.csv"
+        return ksau_census.TorsionStore(ksau_census.torsion_store_dir(knot_path, link_path, _CACHE_DIR))
+
+    def jones_store(self) -> ksau_jones.JonesStore:
+        """
+        全センサスの Jones 多項式を CSR 形式（int64 係数 + オフセット）で返す。
+        jones_polynomial_vector の文字列は初回に一度だけパースされ、data/cache/jones/ に保存される。
+        詳細は ksau_jones.JonesStore を参照。
+        """
+        knot_path = _DATA_DIR / "knotinfo_data_complete.csv"
+        link_path = _DATA_DIR / "linkinfo_data_complete.csv"
+        return ksau_jones.JonesStore(ksau_jones.jones_store_dir(knot_path, link_path, _CACHE_DIR))
+
+    def jones_eval(self, names, q_values) -> np.ndarray:
+        """
+        Jones 多項式を複数の q で一度に評価し、(len(names), len(q_values)) の複素行列を返す。
+
+        names が None ならストアの全行（KnotInfo → LinkInfo の順）を評価する。
+        KnotInfo は t^p、LinkInfo は x^p = t^{p/2} の規約で評価される。
+        例: ssot.jones_eval(['4_1', 'L6a4'], np.exp(2j * np.pi / np.array([24, 48])))
+        """
+        store = self.jones_store()
+        positions = None if names is None else store.positions(list(names))
+        return ksau_jones.jones_eval(store, q_values, positions)
+
+    def jones_roots(self) -> ksau_jones.JonesRoots:
+        """
+        全センサスの Jones 多項式の根の絶対値・偏角を返す（初回に一括で求めて data/cache/jones/ に保存）。
+        例: roots = ssot.jones_roots(); seg, phase = roots.phases(store.positions(names))
+        """
+        return ksau_jones.JonesRoots(self.jones_store())
+
+    def cyclotomic_cache(self) -> ksau_jones.CyclotomicCache:
+        """
+        q = exp(2πi/n)（n >= 2）での Jones 値を項ごとの剰余から求めるキャッシュを返す。
+        例: cc = ssot.cyclotomic_cache(); re_sign, im_sign = cc.signs(24, store.positions(names))
+            （多項式の無い行の符号は ksau_jones.MISSING_SIGN）
+        """
+        return ksau_jones.CyclotomicCache(self.jones_store())
+
     def analysis_params(self) -> dict:
         """constants.json の analysis_parameters セクションを返す。"""
         return self.constants().get("analysis_parameters", {})
@@ -87,3 +258,8 @@ class SSOT:
     def data_dir(self) -> Path:
         """KnotInfo データディレクトリの Path オブジェクト（デバッグ用）。"""
         return _DATA_DIR
+
+    @property
+    def cache_dir(self) -> Path:
+        """センサスのバイナリキャッシュディレクトリの Path オブジェクト（デバッグ用）。"""
+        return _CACHE_DIR
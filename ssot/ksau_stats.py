@@ -0,0 +1,789 @@
+"""
+ksau_stats.py — KSAU 帰無仮説検定・再標本化エンジン
+
+Researcher のコードで繰り返し書かれてきた「n=10,000, seed=42」の帰無検定を、
+試行ごとの Python ループではなく配列演算でまとめて実行するための共通部品。
+
+    import ksau_stats
+    from ksau_ssot import SSOT
+
+    ssot = SSOT()
+    pools = ksau_stats.pools_by_components(ssot.invariant_matrix())
+    engine = ksau_stats.NullEngine(pools, particles, slopes={"lepton": 20 * kappa, "quark": 10 * kappa})
+    null = engine.run(n_trials=1_000_000, seed=42)
+    p = ksau_stats.empirical_p_value(null["r2"], ksau_r2, greater=True)
+
+配列化できない「ランダムなデータに再当てはめして比べる」型の帰無検定は fpr_refit_test() で
+試行ごとに独立な乱数系列を割り当て、プロセスプールに分配する（結果はワーカー数によらない）。
+
+    def null_trial(rng):                          # モジュールのトップレベルに置く
+        return law.fit(rng.uniform(-5, 15, law.n))["mae_pct"]
+
+    res = ksau_stats.fpr_refit_test(null_trial, observed=obs_mae, n_trials=1000, workers=8,
+                                    checkpoint=output_dir / "fpr_checkpoint.npz")
+
+仮説ファイルの閾値に対する判定だけが必要なら sequential_p_value() で逐次的に試行を足し、
+判定が確定した時点で打ち切る（使った試行数と p 値の信頼区間は results.json に記録する）。
+
+    seq = ksau_stats.sequential_p_value(null_batch, observed, ssot.hypothesis("H19"),
+                                        results_path=output_dir / "results.json")
+"""
+
+import json
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+from scipy.stats import beta as beta_dist
+
+# NullEngine.run() が一度に展開する試行数（(chunk, n_particles) 行列のメモリ上限を決める）
+_NULL_CHUNK = 100_000
+
+# NullEngine.run() が独立した乱数系列を割り当てる試行ブロックの大きさ（chunk はこの倍数に丸める）
+_NULL_BLOCK = 4096
+
+# permutation_test() がこの数以下の並べ替えなら全列挙する（9! = 362,880、10! = 3,628,800）
+_EXACT_PERMUTATION_LIMIT = 10_000_000
+
+# permutation_test() が一度に評価する並べ替えの数
+_PERMUTATION_BLOCK = 50_000
+
+# bootstrap_linregress() が一度に展開する再標本数
+_BOOTSTRAP_CHUNK = 1_000_000
+
+# 帰無統計量と観測値の一致判定に使う相対許容誤差（恒等置換の丸め誤差を吸収する）
+_TIE_RTOL = 1e-12
+
+# fpr_refit_test() が 1 つのタスクとしてワーカーに渡す試行数
+_FPR_TASK_TRIALS = 16
+
+# fpr_refit_test() がチェックポイントを書き出す最短間隔 [秒]
+_FPR_CHECKPOINT_SEC = 30.0
+
+# sequential_p_value() が判定のたびに追加する試行数
+_SEQUENTIAL_BATCH = 100
+
+
+def pools_by_components(inv) -> dict:
+    """
+    InvariantMatrix の双曲的な結び目・絡み目を成分数ごとの体積配列に分ける。
+
+    Returns:
+        {1: 結び目の体積, 2: 2 成分絡み目の体積, 3: ...}
+    """
+    volume = np.asarray(inv.column("volume"))
+    components = np.asarray(inv.column("components"))
+    return {
+        int(c): volume[components == c]
+        for c in np.unique(components[np.isfinite(components)])
+    }
+
+
+def empirical_p_value(null, observed: float, greater: bool = True) -> float:
+    """
+    帰無分布 null に対する経験 p 値（従来スクリプトと同じ count / n の定義）。
+
+    greater=True なら null >= observed（R² など大きいほど良い指標）、
+    False なら null <= observed（MAE など小さいほど良い指標）の割合。
+    """
+    null = np.asarray(null)
+    hits = np.count_nonzero(null >= observed) if greater else np.count_nonzero(null <= observed)
+    return hits / len(null)
+
+
+class NullEngine:
+    """
+    ランダムなトポロジー割り当てによる質量–体積相関の帰無仮説エンジン。
+
+    各粒子は候補プール（成分数ごとに分けた体積配列）から一様に 1 つの体積を引く。
+    全試行分の (n_trials, n_particles) 添字行列をプールごとに一度に生成し、
+    セクターごとの切片（傾き固定なら B = mean(ln m - slope·V)、slope=None なら OLS）と
+    対数スケール R²・MAE[%] を全試行まとめてブロードキャストで計算する。
+
+    乱数は _NULL_BLOCK 試行ごとのブロック b に SeedSequence(seed, spawn_key=(b,)).spawn() で
+    プールごとの独立した系列を割り当て、ブロック単位で引く。chunk はブロックの倍数に丸めるので、
+    同じ seed と n_trials なら chunk の大きさによらず同じ帰無分布になる。
+    """
+
+    def __init__(self, pools: dict, particles: list, slopes: dict):
+        """
+        Args:
+            pools: {プールのキー: 候補体積の 1 次元配列}（pools_by_components() の返り値など）
+            particles: 粒子ごとの dict のリスト。キーは
+                'pool'（pools のキー）, 'observed_mass', 'sector'、
+                任意で 'offset'（ln m の予測に足す定数。例: κ·twist）
+            slopes: {sector: 固定傾き}。None を与えたセクターは傾きも OLS で当てはめる。
+        """
+        self.pool_keys = list(dict.fromkeys(p["pool"] for p in particles))
+        self.pools = [np.asarray(pools[k], dtype=np.float64) for k in self.pool_keys]
+        for key, pool in zip(self.pool_keys, self.pools):
+            if len(pool) == 0:
+                raise ValueError(f"Empty candidate pool: {key}")
+
+        self.particles = particles
+        self.log_mass = np.log([p["observed_mass"] for p in particles])
+        self.offset = np.array([p.get("offset", 0.0) for p in particles], dtype=np.float64)
+        self.pool_of = np.array([self.pool_keys.index(p["pool"]) for p in particles])
+
+        self.sectors = list(dict.fromkeys(p["sector"] for p in particles))
+        self.sector_of = np.array([self.sectors.index(p["sector"]) for p in particles])
+        self.slopes = [slopes.get(s) for s in self.sectors]
+
+        ss = self.log_mass - self.log_mass.mean()
+        self._ss_tot = float(ss @ ss)
+
+    def draw(self, n_trials: int, rngs) -> np.ndarray:
+        """(n_trials, n_particles) の体積行列を引く。rngs はプールごとの Generator。"""
+        volumes = np.empty((n_trials, len(self.particles)))
+        for k, (pool, rng) in enumerate(zip(self.pools, rngs)):
+            cols = np.flatnonzero(self.pool_of == k)
+            idx = rng.integers(0, len(pool), size=(n_trials, len(cols)))
+            volumes[:, cols] = pool[idx]
+        return volumes
+
+    def _block_rngs(self, seed: int, block: int) -> list:
+        # 試行ブロック block のプールごとの Generator（Generator.integers は呼び出しをまたいで
+        # 32 bit の余りを持ち越さないため、chunk の切り方によらないようにブロックごとに系列を分ける）
+        children = np.random.SeedSequence(seed, spawn_key=(block,)).spawn(len(self.pools))
+        return [np.random.default_rng(c) for c in children]
+
+    def evaluate(self, volumes: np.ndarray) -> dict:
+        """体積行列 (n_trials, n_particles) の各行について切片を当てはめ、R² と MAE[%] を返す。"""
+        volumes = np.atleast_2d(volumes)
+        target = self.log_mass - self.offset
+        log_pred = np.empty_like(volumes)
+        for s, slope in enumerate(self.slopes):
+            cols = self.sector_of == s
+            v = volumes[:, cols]
+            y = target[cols]
+            if slope is None:
+                dv = v - v.mean(axis=1, keepdims=True)
+                var = (dv * dv).sum(axis=1)
+                b = np.divide(dv @ (y - y.mean()), var, out=np.zeros(len(v)), where=var > 0)
+            else:
+                b = np.full(len(v), slope)
+            a = y.mean() - b * v.mean(axis=1)
+            log_pred[:, cols] = b[:, None] * v + a[:, None] + self.offset[cols]
+
+        resid = self.log_mass - log_pred
+        r2 = 1.0 - (resid * resid).sum(axis=1) / self._ss_tot
+        mae = np.abs(np.expm1(-resid)).mean(axis=1) * 100.0
+        return {"r2": r2, "mae": mae}
+
+    def run(self, n_trials: int = 10_000, seed: int = 42, chunk: int = _NULL_CHUNK, sinks=None) -> dict:
+        """
+        n_trials 回のランダム割り当てを評価し、帰無分布を返す。
+
+        sinks に {'r2': StreamingStats, 'mae': StreamingStats} を渡すと、各チャンクの値は
+        sink に流し込むだけで配列としては保持しない（試行数によらずメモリ一定）。
+
+        Returns:
+            {'r2': ndarray, 'mae': ndarray, 'n_trials': int, 'seed': int}
+            sinks を渡した場合は 'r2' / 'mae' の代わりに 'sinks'
+        """
+        chunk = max(_NULL_BLOCK, chunk - chunk % _NULL_BLOCK)
+        keep = sinks is None
+        if keep:
+            r2 = np.empty(n_trials)
+            mae = np.empty(n_trials)
+        for start in range(0, n_trials, chunk):
+            n = min(chunk, n_trials - start)
+            volumes = np.concatenate([
+                self.draw(min(_NULL_BLOCK, start + n - b), self._block_rngs(seed, b // _NULL_BLOCK))
+                for b in range(start, start + n, _NULL_BLOCK)
+            ])
+            metrics = self.evaluate(volumes)
+            if keep:
+                r2[start:start + n] = metrics["r2"]
+                mae[start:start + n] = metrics["mae"]
+            else:
+                for key, sink in sinks.items():
+                    sink.update(metrics[key])
+        if keep:
+            return {"r2": r2, "mae": mae, "n_trials": n_trials, "seed": seed}
+        return {"sinks": sinks, "n_trials": n_trials, "seed": seed}
+
+
+def _fpr_task(args):
+    trial, seed, start, stop = args
+    # SeedSequence(seed, spawn_key=(i,)) は SeedSequence(seed).spawn(n)[i] と同じ系列
+    return start, np.array([trial(np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(i,))))
+                            for i in range(start, stop)], dtype=np.float64)
+
+
+def _load_fpr_checkpoint(path: Path, n_trials: int, seed: int, chunk: int) -> np.ndarray:
+    with np.load(path) as ck:
+        meta = (int(ck["n_trials"]), int(ck["seed"]), int(ck["chunk"]))
+        if meta != (n_trials, seed, chunk):
+            raise ValueError(f"Checkpoint {path} was written for (n_trials, seed, chunk)={meta}, "
+                             f"not {(n_trials, seed, chunk)}")
+        return ck["null"].copy(), ck["done"].copy()
+
+
+def _save_fpr_checkpoint(path: Path, null: np.ndarray, done: np.ndarray, n_trials: int, seed: int, chunk: int):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, null=null, done=done, n_trials=n_trials, seed=seed, chunk=chunk)
+    os.replace(tmp, path)
+
+
+def fpr_refit_test(trial, observed: float, n_trials: int = 10_000, seed: int = 42, greater: bool = False,
+                   workers: int = 1, chunk: int = _FPR_TASK_TRIALS, checkpoint=None) -> dict:
+    """
+    「ランダム化したデータに再当てはめした統計量が観測値に届くか」を n_trials 回数える帰無検定。
+
+    試行 i には SeedSequence(seed).spawn(n_trials)[i] の Generator を渡すので、帰無分布は
+    ワーカー数・chunk・中断の有無によらずビット単位で同じになる。試行は chunk 個ずつのタスクとして
+    プロセスプールに分配し、checkpoint を与えると完了したタスクの結果を定期的に保存する
+    （同じ引数で呼び直すと、保存済みのタスクを飛ばして続きから再開する）。
+
+    Args:
+        trial: trial(rng) -> 帰無統計量 の関数（workers > 1 ではモジュールのトップレベル関数か
+            functools.partial にすること）
+        observed: 観測データでの統計量
+        greater: True なら null >= observed、False なら null <= observed の試行を数える（MAE なら False）
+        workers: プロセス数（1 ならこのプロセスで順に実行）
+        chunk: 1 タスクあたりの試行数
+        checkpoint: チェックポイント (.npz) のパス
+
+    Returns:
+        {'fpr', 'hits', 'n_trials', 'seed', 'observed', 'null'}
+    """
+    n_tasks = -(-n_trials // chunk)
+    null = np.full(n_trials, np.nan)
+    done = np.zeros(n_tasks, dtype=bool)
+    if checkpoint is not None:
+        checkpoint = Path(checkpoint)
+        if checkpoint.exists():
+            null, done = _load_fpr_checkpoint(checkpoint, n_trials, seed, chunk)
+
+    tasks = [(trial, seed, t * chunk, min((t + 1) * chunk, n_trials)) for t in np.flatnonzero(~done).tolist()]
+    last_save = time.monotonic()
+
+    def record(start, values):
+        nonlocal last_save
+        null[start:start + len(values)] = values
+        done[start // chunk] = True
+        if checkpoint is not None and time.monotonic() - last_save >= _FPR_CHECKPOINT_SEC:
+            _save_fpr_checkpoint(checkpoint, null, done, n_trials, seed, chunk)
+            last_save = time.monotonic()
+
+    try:
+        if workers == 1:
+            for task in tasks:
+                record(*_fpr_task(task))
+        else:
+            ex = ProcessPoolExecutor(max_workers=workers)
+            pending = set()
+            try:
+                # 未完了のタスクを workers の数倍だけ投入しておき、終わった順に補充する
+                queue = iter(tasks)
+                pending = {ex.submit(_fpr_task, t) for _, t in zip(range(workers * 4), queue)}
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        record(*fut.result())
+                        pending.discard(fut)
+                    pending |= {ex.submit(_fpr_task, t) for _, t in zip(range(len(finished)), queue)}
+            finally:
+                # 中断されたら未着手のタスクを取り消し、実行中・未記録のタスクの結果を拾ってから閉じる
+                for fut in pending:
+                    fut.cancel()
+                for fut in pending:
+                    if not fut.cancelled() and fut.exception() is None:
+                        record(*fut.result())
+                ex.shutdown(wait=True, cancel_futures=True)
+    finally:
+        if checkpoint is not None and tasks:
+            _save_fpr_checkpoint(checkpoint, null, done, n_trials, seed, chunk)
+
+    hits = int(np.count_nonzero(null >= observed if greater else null <= observed))
+    return {
+        "fpr": hits / n_trials,
+        "hits": hits,
+        "n_trials": n_trials,
+        "seed": seed,
+        "observed": float(observed),
+        "null": null,
+    }
+
+
+def hypothesis_threshold(hypothesis, key: str = "bonferroni_corrected_p_max") -> float:
+    """
+    仮説ファイル（ssot.hypothesis() の dict または JSON のパス）の rejection_criteria から閾値を読む。
+    bonferroni_corrected_p_max が無ければ success_criteria の bonferroni_corrected_threshold を使う。
+    """
+    if not isinstance(hypothesis, dict):
+        with open(hypothesis, encoding="utf-8") as f:
+            hypothesis = json.load(f)
+    rejection = hypothesis.get("rejection_criteria", {})
+    if key in rejection:
+        return float(rejection[key])
+    success = hypothesis.get("success_criteria", {})
+    if key == "bonferroni_corrected_p_max" and "bonferroni_corrected_threshold" in success:
+        return float(success["bonferroni_corrected_threshold"])
+    raise ValueError(f"Hypothesis {hypothesis.get('id', '?')} has no threshold '{key}'")
+
+
+def _clopper_pearson(hits: int, n: int, alpha: float) -> tuple[float, float]:
+    """二項比率 hits / n の両側 1 - alpha Clopper–Pearson 区間。"""
+    lo = 0.0 if hits == 0 else float(beta_dist.ppf(alpha / 2, hits, n - hits + 1))
+    hi = 1.0 if hits == n else float(beta_dist.ppf(1 - alpha / 2, hits + 1, n - hits))
+    return lo, hi
+
+
+def sequential_p_value(null_batch, observed: float, hypothesis, key: str = "bonferroni_corrected_p_max",
+                       greater: bool = True, error_rate: float = 1e-3, max_trials: int = 10_000,
+                       batch: int = _SEQUENTIAL_BATCH, seed: int = 42, results_path=None) -> dict:
+    """
+    仮説ファイルの閾値に対するモンテカルロ p 値の判定を、確定した時点で打ち切る逐次検定。
+
+    batch 試行ごとに p 値の Clopper–Pearson 区間を作り、区間が閾値より下なら有意、上なら非有意で
+    停止する。判定の回数は高々 ceil(max_trials / batch) 回なので、各回の区間を
+    error_rate / 判定回数 の水準で作れば（Bonferroni）、どの時点で止めても誤判定の確率は
+    error_rate 以下になる。max_trials に達しても確定しなければ点推定で判定し certain=False とする。
+
+    Args:
+        null_batch: null_batch(n, rng) -> (n,) の帰無統計量（rng はバッチごとの Generator）
+        observed: 観測データでの統計量
+        hypothesis: ssot.hypothesis("H19") の dict または仮説 JSON のパス
+        key: 閾値のキー（"bonferroni_corrected_p_max" または "fpr_max"）
+        greater: True なら null >= observed、False なら null <= observed を数える
+        error_rate: 判定を誤る確率の上限
+        batch: 判定ごとに追加する試行数（バッチ b の乱数は SeedSequence(seed).spawn() の b 番目）
+        results_path: 与えると results.json の computed_values.sequential_test に結果を書き込む
+
+    Returns:
+        {'p_value', 'p_interval', 'threshold', 'threshold_key', 'decision', 'certain',
+         'hits', 'n_trials', 'max_trials', 'error_rate', 'seed'}
+        decision は "significant"（p <= 閾値）または "not_significant"
+    """
+    if max_trials < 1 or batch < 1:
+        raise ValueError(f"max_trials and batch must be positive (got {max_trials}, {batch})")
+    threshold = hypothesis_threshold(hypothesis, key)
+    alpha = error_rate / -(-max_trials // batch)
+    hits = n = 0
+    lo, hi = 0.0, 1.0
+    certain = False
+    for b in range(-(-max_trials // batch)):
+        m = min(batch, max_trials - n)
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(b,)))
+        null = np.asarray(null_batch(m, rng))
+        hits += int(np.count_nonzero(null >= observed if greater else null <= observed))
+        n += m
+        lo, hi = _clopper_pearson(hits, n, alpha)
+        if hi <= threshold or lo > threshold:
+            certain = True
+            break
+
+    p_value = hits / n
+    out = {
+        "p_value": p_value,
+        "p_interval": [lo, hi],
+        "threshold": threshold,
+        "threshold_key": key,
+        "decision": "significant" if (hi <= threshold if certain else p_value <= threshold) else "not_significant",
+        "certain": certain,
+        "hits": hits,
+        "n_trials": n,
+        "max_trials": max_trials,
+        "error_rate": error_rate,
+        "seed": seed,
+    }
+    if results_path is not None:
+        results_path = Path(results_path)
+        results = {}
+        if results_path.exists():
+            with open(results_path, encoding="utf-8") as f:
+                results = json.load(f)
+        results.setdefault("computed_values", {})["sequential_test"] = out
+        with open(results_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return out
+
+
+def unrank_permutations(ranks, n: int) -> np.ndarray:
+    """
+    辞書式順位 ranks（0 <= rank < n!）を長さ n の置換 (len(ranks), n) に一括変換する。
+
+    階乗進法（Lehmer 符号）の各桁で「残っている要素の何番目か」を選び、
+    選んだ要素を取り除くという操作を全行まとめて行う。n <= 20（n! < 2^63）まで。
+    """
+    ranks = np.asarray(ranks, dtype=np.int64)
+    avail = np.broadcast_to(np.arange(n), (len(ranks), n))
+    perms = np.empty((len(ranks), n), dtype=np.int64)
+    rest = ranks.copy()
+    for k in range(n):
+        base = math.factorial(n - 1 - k)
+        digit = rest // base
+        rest -= digit * base
+        perms[:, k] = avail[np.arange(len(ranks)), digit]
+        keep = np.arange(n - k)[None, :] != digit[:, None]
+        avail = avail[keep].reshape(len(ranks), n - k - 1)
+    return perms
+
+
+def permutation_test(data, statistic, greater: bool = False, exact_limit: int = _EXACT_PERMUTATION_LIMIT,
+                     n_samples: int = 100_000, seed: int = 42, block: int = _PERMUTATION_BLOCK) -> dict:
+    """
+    data を並べ替えたときの統計量の分布に対する置換検定。
+
+    n! <= exact_limit（または n_samples >= n!）なら全ての並べ替えを block 個ずつ列挙して厳密な p 値を返す。
+    それを超える場合は順位空間 [0, n!) を n_samples 個の等幅の層に分け、
+    各層から 1 つずつ一様に引く層化抽出を行う（n > 20 では単純な一様抽出）。
+
+    Args:
+        data: 並べ替える 1 次元配列（例: 観測質量）
+        statistic: (B, n) の並べ替え済みデータを受け取り (B,) の統計量を返す関数
+        greater: True なら統計量が観測値以上、False なら以下の並べ替えを数える
+        exact_limit: 全列挙する並べ替え数の上限
+        n_samples: 抽出にフォールバックしたときの並べ替え数
+        seed: 抽出時の乱数シード
+
+    Returns:
+        {'observed', 'p_value', 'count', 'n_permutations', 'exact', 'p_value_se'}
+        exact=True のとき p_value は厳密値（恒等置換を含む count / n!）で p_value_se は 0。
+    """
+    data = np.asarray(data)
+    n = len(data)
+    observed = float(statistic(data[None, :])[0])
+    n_total = math.factorial(n)
+    exact = n_total <= max(exact_limit, n_samples)
+
+    def count_hits(perms):
+        null = statistic(data[perms])
+        close = np.isclose(null, observed, rtol=_TIE_RTOL, atol=0.0)
+        return int(np.count_nonzero(((null > observed) if greater else (null < observed)) | close))
+
+    count = 0
+    if exact:
+        n_perm = n_total
+        for start in range(0, n_total, block):
+            count += count_hits(unrank_permutations(np.arange(start, min(start + block, n_total)), n))
+    else:
+        n_perm = n_samples
+        rng = np.random.default_rng(seed)
+        if n <= 20:
+            # n! = q·N + r と分けると i·n!/N の切り捨ては i·q + (i·r) // N（どちらも int64 に収まる）
+            q_stride, r_stride = divmod(n_total, n_samples)
+        for start in range(0, n_samples, block):
+            m = min(block, n_samples - start)
+            if n <= 20:
+                # 層 i = [i·n!/N, (i+1)·n!/N) から 1 つ引く（float では n! を正確に表せないので整数で区切る）
+                bounds = np.arange(start, start + m + 1, dtype=np.int64)
+                bounds = bounds * q_stride + bounds * r_stride // n_samples
+                lo, hi = bounds[:-1], bounds[1:]
+                perms = unrank_permutations(lo + rng.integers(0, hi - lo), n)
+            else:
+                perms = rng.permuted(np.broadcast_to(np.arange(n), (m, n)), axis=1)
+            count += count_hits(perms)
+
+    p_value = count / n_perm
+    return {
+        "observed": observed,
+        "p_value": p_value,
+        "count": count,
+        "n_permutations": n_perm,
+        "exact": exact,
+        "p_value_se": 0.0 if exact else math.sqrt(p_value * (1.0 - p_value) / n_perm),
+    }
+
+
+def _linregress_from_sums(n, sx, sy, sxx, sxy, syy):
+    """Σx, Σy, Σx², Σxy, Σy² から (slope, intercept, r2) を計算する（x が定数の行は NaN）。"""
+    cxx = sxx - sx * sx / n
+    cxy = sxy - sx * sy / n
+    cyy = syy - sy * sy / n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        degenerate = cxx <= 1e-12 * np.maximum(sxx, 1.0)
+        slope = np.where(degenerate, np.nan, cxy / cxx)
+        intercept = (sy - slope * sx) / n
+        r2 = np.where(degenerate | (cyy <= 0), np.nan, cxy * cxy / (cxx * cyy))
+    return slope, intercept, r2
+
+
+def bootstrap_linregress(x, y, n_resamples: int = 10_000, seed: int = 42, confidence: float = 0.95,
+                         method: str = "percentile", chunk: int = _BOOTSTRAP_CHUNK,
+                         return_samples: bool = False) -> dict:
+    """
+    y = slope·x + intercept のブートストラップ信頼区間を閉形式の一括計算で求める。
+
+    (B, n) の再標本添字行列から行ごとの Σx, Σy, Σx², Σxy, Σy² をまとめて取り、
+    全再標本の傾き・切片・R² を一度に計算する（scipy.stats.linregress のループは不要）。
+    x が全て同じ値になった再標本は従来どおり除外する。
+
+    Args:
+        method: 'percentile' または 'bca'（バイアス補正・加速度付き。加速度は jackknife で推定）
+        chunk: 一度に生成する再標本数（同じ seed なら chunk によらず同じ結果）
+        return_samples: True なら各再標本の値も 'samples' に入れて返す
+
+    Returns:
+        {'slope': {...}, 'intercept': {...}, 'r2': {...}, 'n_resamples', 'n_valid', 'method', 'seed'}
+        各統計量は {'estimate', 'mean', 'std', 'ci': [lo, hi]}。
+    """
+    if method not in ("percentile", "bca"):
+        raise ValueError(f"Unknown bootstrap method: {method}")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    rng = np.random.default_rng(seed)
+
+    samples = {"slope": np.empty(n_resamples), "intercept": np.empty(n_resamples), "r2": np.empty(n_resamples)}
+    for start in range(0, n_resamples, chunk):
+        m = min(chunk, n_resamples - start)
+        idx = rng.integers(0, n, size=(m, n))
+        xs, ys = x[idx], y[idx]
+        stats = _linregress_from_sums(n, xs.sum(axis=1), ys.sum(axis=1), (xs * xs).sum(axis=1),
+                                      (xs * ys).sum(axis=1), (ys * ys).sum(axis=1))
+        for key, values in zip(samples, stats):
+            samples[key][start:start + m] = values
+
+    full = _linregress_from_sums(n, x.sum(), y.sum(), x @ x, x @ y, y @ y)
+    valid = np.isfinite(samples["slope"])
+
+    # jackknife（1 点除外）の推定値。BCa の加速度 a に使う
+    jack = _linregress_from_sums(n - 1, x.sum() - x, y.sum() - y, x @ x - x * x, x @ y - x * y, y @ y - y * y)
+
+    alpha = (1.0 - confidence) / 2.0
+    out = {"n_resamples": n_resamples, "n_valid": int(valid.sum()), "method": method, "seed": seed}
+    for key, estimate, jk in zip(samples, full, jack):
+        boot = samples[key][valid & np.isfinite(samples[key])]
+        lo_q, hi_q = alpha, 1.0 - alpha
+        if method == "bca":
+            lo_q, hi_q = _bca_quantiles(boot, float(estimate), jk[np.isfinite(jk)], alpha)
+        out[key] = {
+            "estimate": float(estimate),
+            "mean": float(boot.mean()),
+            "std": float(boot.std(ddof=1)),
+            "ci": [float(np.quantile(boot, lo_q)), float(np.quantile(boot, hi_q))],
+        }
+        if return_samples:
+            out.setdefault("samples", {})[key] = samples[key]
+    return out
+
+
+def _bca_quantiles(boot: np.ndarray, estimate: float, jack: np.ndarray, alpha: float) -> tuple[float, float]:
+    """BCa 区間の補正後の分位点 (lo, hi) を返す。"""
+    nd = NormalDist()
+    frac = np.clip(np.mean(boot < estimate), 1.0 / (len(boot) + 1), 1.0 - 1.0 / (len(boot) + 1))
+    z0 = nd.inv_cdf(float(frac))
+    d = jack.mean() - jack
+    denom = 6.0 * float(d @ d) ** 1.5
+    a = float((d ** 3).sum()) / denom if denom > 0 else 0.0
+
+    def adjust(q):
+        z = nd.inv_cdf(q)
+        return nd.cdf(z0 + (z0 + z) / (1.0 - a * (z0 + z)))
+
+    return adjust(alpha), adjust(1.0 - alpha)
+
+
+class StreamingStats:
+    """
+    探索・帰無検定の出力を全件保持せずに集計するストリーミング統計シンク。
+
+    all_maes のようなリストの代わりに使う。保持するのは以下だけなので、
+    評価した組合せの数によらず to_dict() の出力は数 KB に収まる。
+
+    - 件数・最小・最大・平均・分散（厳密）
+    - reference 以下（lower_is_better=False なら以上）の件数 = 参照割り当ての順位（厳密）
+    - thresholds の各値以下の件数（厳密）
+    - 固定ビンのヒストグラム（範囲外は underflow / overflow）
+    - 分位点用のマージ可能な t-digest スケッチ（近似）
+
+    並列ワーカーの部分結果は merge() で安価に合算できる。
+    """
+
+    def __init__(self, reference=None, thresholds=(), bins=None, lower_is_better: bool = True,
+                 rank_tol: float = 0.0, compression: int = 200):
+        """
+        Args:
+            reference: 順位を求める参照値（例: KSAU 割り当ての MAE）
+            thresholds: 「この値以下」の件数を数える閾値のリスト
+            bins: ヒストグラムのビン境界（単調増加の配列）。None ならヒストグラムを作らない
+            lower_is_better: True なら値が小さいほど良い指標（MAE）、False なら大きいほど良い（R²）
+            rank_tol: 参照値との比較に足す許容誤差（従来の `mae <= ksau_mae + 0.0001` に相当）
+            compression: t-digest の圧縮パラメータ（大きいほど分位点が正確でサイズが大きい）
+        """
+        self.reference = reference
+        self.thresholds = [float(t) for t in thresholds]
+        self.bins = None if bins is None else np.asarray(bins, dtype=np.float64)
+        self.lower_is_better = lower_is_better
+        self.rank_tol = rank_tol
+        self.compression = compression
+
+        self.count = 0
+        self.n_nan = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.rank = 0
+        self.below = np.zeros(len(self.thresholds), dtype=np.int64)
+        self.hist = None if self.bins is None else np.zeros(len(self.bins) - 1, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self._centroids = np.empty(0)
+        self._weights = np.empty(0)
+
+    def update(self, values) -> None:
+        """値の配列（1 チャンク分）を取り込む。NaN は n_nan として数えるだけで集計から除く。"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        nan = np.isnan(values)
+        self.n_nan += int(nan.sum())
+        values = values[~nan]
+        if len(values) == 0:
+            return
+
+        self._combine(len(values), float(values.mean()), float(((values - values.mean()) ** 2).sum()))
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+        if self.reference is not None:
+            if self.lower_is_better:
+                self.rank += int(np.count_nonzero(values <= self.reference + self.rank_tol))
+            else:
+                self.rank += int(np.count_nonzero(values >= self.reference - self.rank_tol))
+        if self.thresholds:
+            self.below += np.count_nonzero(values[None, :] <= np.array(self.thresholds)[:, None], axis=1)
+        if self.hist is not None:
+            self.hist += np.histogram(values, bins=self.bins)[0]
+            self.underflow += int(np.count_nonzero(values < self.bins[0]))
+            self.overflow += int(np.count_nonzero(values > self.bins[-1]))
+
+        self._digest(np.concatenate([self._centroids, values]),
+                     np.concatenate([self._weights, np.ones(len(values))]))
+
+    def merge(self, other: "StreamingStats") -> "StreamingStats":
+        """同じ設定の別のシンク（並列ワーカーの部分結果など）を取り込んで self を返す。"""
+        if other.count:
+            self._combine(other.count, other._mean, other._m2)
+        self.n_nan += other.n_nan
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.rank += other.rank
+        self.below += other.below
+        if self.hist is not None:
+            self.hist += other.hist
+            self.underflow += other.underflow
+            self.overflow += other.overflow
+        self._digest(np.concatenate([self._centroids, other._centroids]),
+                     np.concatenate([self._weights, other._weights]))
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.count else float("nan")
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self._m2 / (self.count - 1))) if self.count > 1 else float("nan")
+
+    def quantile(self, q):
+        """t-digest による分位点の近似値（q はスカラーまたは配列、0〜1）。"""
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan) if q.ndim else float("nan")
+        cum = np.cumsum(self._weights) - self._weights / 2.0
+        xs = np.concatenate([[self.minimum], self._centroids, [self.maximum]])
+        ps = np.concatenate([[0.0], cum / self.count, [1.0]])
+        out = np.interp(q, ps, xs)
+        return out if q.ndim else float(out)
+
+    def percentile_of_reference(self) -> float:
+        """参照値の順位を総件数に対する割合 [%] で返す（従来の Top Percentile）。"""
+        return self.rank / self.count * 100.0 if self.count else float("nan")
+
+    def to_dict(self) -> dict:
+        """results.json にそのまま書ける dict を返す（数 KB）。"""
+        out = {
+            "count": self.count,
+            "n_nan": self.n_nan,
+            "min": self.minimum if self.count else None,
+            "max": self.maximum if self.count else None,
+            "mean": self.mean if self.count else None,
+            "std": self.std if self.count > 1 else None,
+            "reference": self.reference,
+            "rank": self.rank if self.reference is not None else None,
+            "lower_is_better": self.lower_is_better,
+            "rank_tol": self.rank_tol,
+            "thresholds": self.thresholds,
+            "count_below": self.below.tolist(),
+            "quantiles": {str(q): self.quantile(q) for q in (0.001, 0.01, 0.05, 0.5, 0.95, 0.99, 0.999)}
+            if self.count else {},
+            "compression": self.compression,
+            "digest": {"means": self._centroids.tolist(), "weights": self._weights.tolist()},
+            "m2": self._m2,
+        }
+        if self.hist is not None:
+            out["histogram"] = {
+                "bins": self.bins.tolist(),
+                "counts": self.hist.tolist(),
+                "underflow": self.underflow,
+                "overflow": self.overflow,
+            }
+        return out
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "StreamingStats":
+        """to_dict() の出力から復元する（チェックポイントや別プロセスの結果のマージ用）。"""
+        hist = d.get("histogram")
+        sink = cls(reference=d["reference"], thresholds=d["thresholds"],
+                   bins=None if hist is None else hist["bins"], lower_is_better=d["lower_is_better"],
+                   rank_tol=d["rank_tol"], compression=d["compression"])
+        sink.count = d["count"]
+        sink.n_nan = d["n_nan"]
+        if sink.count:
+            sink.minimum, sink.maximum, sink._mean = d["min"], d["max"], d["mean"]
+        sink._m2 = d["m2"]
+        sink.rank = d["rank"] or 0
+        sink.below = np.array(d["count_below"], dtype=np.int64)
+        if hist is not None:
+            sink.hist = np.array(hist["counts"], dtype=np.int64)
+            sink.underflow, sink.overflow = hist["underflow"], hist["overflow"]
+        sink._centroids = np.array(d["digest"]["means"], dtype=np.float64)
+        sink._weights = np.array(d["digest"]["weights"], dtype=np.float64)
+        return sink
+
+    def _combine(self, n: int, mean: float, m2: float) -> None:
+        # Chan らの並列分散公式で (count, mean, M2) を合算する
+        total = self.count + n
+        delta = mean - self._mean
+        self._m2 += m2 + delta * delta * self.count * n / total
+        self._mean += delta * n / total
+        self.count = total
+
+    def _digest(self, means: np.ndarray, weights: np.ndarray) -> None:
+        # マージ型 t-digest（Dunning & Ertl）: 昇順に並べ、k(q_right) - k(q_left) <= 1 を満たす限り
+        # 隣の点を貪欲に同じ重心へまとめる。スケール関数は参照実装の既定と同じ
+        # k2(q) = δ/Z·log(q/(1-q))、Z = 4·log(N/δ) + 24（重心の幅が q(1-q) に比例するので裾まで正確）
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        if len(means) <= self.compression:
+            self._centroids, self._weights = means, weights
+            return
+        cum_w = np.cumsum(weights)
+        cum_wm = np.cumsum(weights * means)
+        total = cum_w[-1]
+        scale = self.compression / (4.0 * np.log(max(total / self.compression, 1.0)) + 24.0)
+        centroids, sizes = [], []
+        start, w_before, wm_before = 0, 0.0, 0.0
+        while start < len(means):
+            q0 = w_before / total
+            if q0 <= 0.0:
+                q_limit = 0.0  # k2(0) = -∞ なので最小値の点は単独の重心になる
+            else:
+                k_limit = scale * np.log(q0 / (1.0 - q0)) + 1.0
+                q_limit = 1.0 / (1.0 + np.exp(-k_limit / scale))
+            # 重心の右端の累積重み <= q_limit·N となる最後の点まで（最低 1 点）をまとめる
+            end = max(start + 1, int(np.searchsorted(cum_w, q_limit * total * (1.0 + 1e-12), side="right")))
+            w = cum_w[end - 1] - w_before
+            centroids.append((cum_wm[end - 1] - wm_before) / w)
+            sizes.append(w)
+            start, w_before, wm_before = end, cum_w[end - 1], cum_wm[end - 1]
+        self._centroids = np.array(centroids)
+        self._weights = np.array(sizes)
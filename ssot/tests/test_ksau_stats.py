@@ -0,0 +1,47 @@
+"""
+ksau_stats の回帰テスト（python -m pytest ssot/tests）。
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import ksau_stats  # noqa: E402
+
+TAIL_QUANTILES = (1e-4, 1e-3, 1e-2, 0.5, 0.99, 0.999, 0.9999)
+
+
+def _rank_error(sorted_values: np.ndarray, estimate: float, q: float) -> float:
+    """推定値の真の順位と q のずれを、裾側の確率 min(q, 1-q) に対する比で返す。"""
+    rank = np.searchsorted(sorted_values, estimate) / len(sorted_values)
+    return abs(rank - q) / min(q, 1.0 - q)
+
+
+def test_streaming_quantiles_match_numpy_in_the_tails():
+    values = np.random.default_rng(1).normal(size=1_000_000)
+    sink = ksau_stats.StreamingStats()
+    for chunk in np.split(values, 1000):
+        sink.update(chunk)
+
+    ordered = np.sort(values)
+    for q in TAIL_QUANTILES:
+        assert _rank_error(ordered, sink.quantile(q), q) < 0.1, q
+    assert abs(sink.to_dict()["quantiles"]["0.001"] - np.quantile(values, 0.001)) < 0.02
+
+
+def test_streaming_quantiles_survive_merge():
+    values = np.random.default_rng(2).exponential(size=400_000)
+    parts = [ksau_stats.StreamingStats() for _ in range(8)]
+    for i, chunk in enumerate(np.split(values, 400)):
+        parts[i % 8].update(chunk)
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(ksau_stats.StreamingStats.from_dict(part.to_dict()))
+
+    assert merged.count == len(values)
+    ordered = np.sort(values)
+    for q in TAIL_QUANTILES:
+        assert _rank_error(ordered, merged.quantile(q), q) < 0.1, q